@@ -1,26 +1,394 @@
+import asyncio
+import sys
+import threading
 import time
+import weakref
+from collections import OrderedDict
+from concurrent.futures import Future
 from dataclasses import dataclass
-from typing import Any
+from typing import Any, Awaitable, Callable
+
+from app.core.cache_backends import CacheBackend
+
+# TTL in seconds, or a function of the value (e.g. derived from expiry data inside it)
+TTL = float | Callable[[Any], float]
 
 
 @dataclass
 class _CacheItem:
     expires_at: float
     value: Any
+    size: int = 0
+    stored_at: float = 0.0
+    hits: int = 0
+    encoded: Any = None
+
+
+@dataclass
+class _BackendEntry:
+    """Row payload of the shared tier: the value plus its encoded body, so L1 fills skip encoding."""
+
+    value: Any
+    encoded: Any = None
+
+
+@dataclass
+class CacheResult:
+    value: Any
+    cached: bool
+    age: float = 0.0
+    stale: bool = False
+    encoded: Any = None
+
+
+def _result(item: _CacheItem, cached: bool, stale: bool = False) -> CacheResult:
+    return CacheResult(
+        value=item.value,
+        cached=cached,
+        age=max(0.0, time.time() - item.stored_at),
+        stale=stale,
+        encoded=item.encoded,
+    )
+
+
+def _approx_size(obj: Any) -> int:
+    """Rough deep size of a value in bytes (dict/list/tuple/set containers are walked)."""
+    seen: set[int] = set()
+    stack = [obj]
+    total = 0
+    while stack:
+        o = stack.pop()
+        if id(o) in seen:
+            continue
+        seen.add(id(o))
+        total += sys.getsizeof(o)
+        if isinstance(o, dict):
+            stack.extend(o.keys())
+            stack.extend(o.values())
+        elif isinstance(o, (list, tuple, set, frozenset)):
+            stack.extend(o)
+        elif hasattr(o, "__dict__"):
+            stack.extend(vars(o).values())
+    return total
+
+
+def _sweep_loop(cache_ref: "weakref.ref[TTLCache]", interval: float) -> None:
+    while True:
+        time.sleep(interval)
+        cache = cache_ref()
+        if cache is None:
+            return
+        cache.sweep()
+        del cache
 
 
 class TTLCache:
-    def __init__(self) -> None:
-        self._store: dict[str, _CacheItem] = {}
+    """
+    Thread-safe TTL cache with LRU eviction.
+
+    `max_entries` / `max_bytes` of 0 mean "unlimited". The byte limit is an
+    estimate (see `_approx_size`), good enough to keep worker RSS bounded.
+    When `sweep_interval_seconds` > 0 a daemon thread periodically drops
+    expired entries, so keys that are never read again don't linger.
+
+    `get_or_compute` / `aget_or_compute` add single-flight on top: concurrent
+    misses for the same key wait for one in-flight computation and share its
+    result (or its error, which is not cached).
+
+    Async lookups also support stale-while-revalidate: for
+    `stale_grace_seconds` after expiry the old value is still served (marked
+    `stale`) while one background refresh runs. With `refresh_ahead_seconds`,
+    keys read at least `refresh_ahead_min_hits` times are refreshed in the
+    background shortly before they expire, so hot keys never go cold.
+
+    An optional shared `backend` (see `app.core.cache_backends`) acts as an L2
+    tier: writes go through to it and L1 misses are filled from it, so all
+    workers on a host share one set of computed values.
+
+    With an `encoder` (e.g. `app.core.responses.make_encoder`) every stored
+    value also keeps its encoded response body, exposed as
+    `CacheResult.encoded`, so hits can be served without serialising again.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 0,
+        max_bytes: int = 0,
+        sweep_interval_seconds: float = 0,
+        stale_grace_seconds: float = 0,
+        refresh_ahead_seconds: float = 0,
+        refresh_ahead_min_hits: int = 2,
+        backend: CacheBackend | None = None,
+        encoder: Callable[[Any], Any] | None = None,
+    ) -> None:
+        self._store: OrderedDict[str, _CacheItem] = OrderedDict()
+        self._lock = threading.RLock()
+        self._bytes = 0
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sweep_interval_seconds = sweep_interval_seconds
+        self.stale_grace_seconds = stale_grace_seconds
+        self.refresh_ahead_seconds = refresh_ahead_seconds
+        self.refresh_ahead_min_hits = refresh_ahead_min_hits
+        self.backend = backend
+        self.encoder = encoder
+        self._sweeper: threading.Thread | None = None
+        self._inflight: dict[str, Future] = {}
+        self._ainflight: dict[str, asyncio.Task] = {}
+        self._compute_tasks: set[asyncio.Task] = set()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._store)
 
     def get(self, key: str) -> Any | None:
-        item = self._store.get(key)
-        if not item:
+        item = self._lookup(key, allow_stale=False)
+        return item.value if item is not None else None
+
+    def set(self, key: str, value: Any, ttl_seconds: TTL) -> None:
+        self._set(key, value, ttl_seconds)
+
+    def _set(self, key: str, value: Any, ttl_seconds: TTL) -> _CacheItem:
+        if callable(ttl_seconds):
+            ttl_seconds = ttl_seconds(value)
+        now = time.time()
+        item = self._put_local(key, value, stored_at=now, expires_at=now + ttl_seconds)
+        if self.backend is not None:
+            self.backend.set(
+                key, _BackendEntry(value, item.encoded), stored_at=item.stored_at, expires_at=item.expires_at
+            )
+        self._ensure_sweeper()
+        return item
+
+    def _put_local(
+        self, key: str, value: Any, stored_at: float, expires_at: float, encoded: Any = None
+    ) -> _CacheItem:
+        """Store in L1; returns the item even when it was too large to keep."""
+        if encoded is None and self.encoder is not None:
+            encoded = self.encoder(value)
+        size = _approx_size((value, encoded)) if self.max_bytes else 0
+        item = _CacheItem(expires_at=expires_at, value=value, size=size, stored_at=stored_at, encoded=encoded)
+        with self._lock:
+            self._remove(key)
+            if self.max_bytes and size > self.max_bytes:
+                # would evict everything else and still not fit
+                return item
+            self._store[key] = item
+            self._bytes += size
+            self._evict()
+            return item
+
+    def get_or_compute(self, key: str, fn: Callable[[], Any], ttl_seconds: TTL) -> CacheResult:
+        """Single-flight lookup for sync callers (e.g. `def` routes running in the threadpool)."""
+        item = self._lookup(key, allow_stale=False)
+        if item is not None:
+            return _result(item, cached=True)
+        with self._lock:
+            # re-check: another thread may have finished between the lookup and taking the lock
+            item = self._store.get(key)
+            if item is not None and time.time() < item.expires_at:
+                return _result(item, cached=True)
+            fut = self._inflight.get(key)
+            leader = fut is None
+            if leader:
+                fut = self._inflight[key] = Future()
+
+        if not leader:
+            return _result(fut.result(), cached=False)
+
+        try:
+            # compute and store under one try: a failing encoder / TTL callable / backend
+            # must reach the followers too, or they would wait forever
+            item = self._set(key, fn(), ttl_seconds)
+        except BaseException as e:
+            fut.set_exception(e)
+            raise
+        else:
+            fut.set_result(item)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+        return _result(item, cached=False)
+
+    async def aget_or_compute(
+        self, key: str, fn: Callable[[], Awaitable[Any]], ttl_seconds: TTL
+    ) -> CacheResult:
+        """
+        Single-flight lookup for async callers; `fn` is called without arguments and awaited.
+        Honours the stale-while-revalidate / refresh-ahead settings of the cache.
+        """
+        item = await self._alookup(key)
+        if item is not None:
+            now = time.time()
+            if now < item.expires_at:
+                if (
+                    self.refresh_ahead_seconds
+                    and item.hits >= self.refresh_ahead_min_hits
+                    and item.expires_at - now <= self.refresh_ahead_seconds
+                ):
+                    self._schedule_refresh(key, fn, ttl_seconds)
+                return _result(item, cached=True)
+            # expired but still inside the grace window
+            self._schedule_refresh(key, fn, ttl_seconds)
+            return _result(item, cached=True, stale=True)
+
+        task = self._ainflight.get(key) or self._start_compute(key, fn, ttl_seconds)
+        # shielded: a cancelled caller (e.g. client went away) must not cancel
+        # the computation other callers are waiting for
+        return _result(await asyncio.shield(task), cached=False)
+
+    def _schedule_refresh(self, key: str, fn: Callable[[], Awaitable[Any]], ttl_seconds: TTL) -> None:
+        # a failed refresh just keeps serving the stale value until the grace window ends
+        if key not in self._ainflight:
+            self._start_compute(key, fn, ttl_seconds)
+
+    def _start_compute(self, key: str, fn: Callable[[], Awaitable[Any]], ttl_seconds: TTL) -> asyncio.Task:
+        """Run the computation as a detached task shared by every waiter of `key`."""
+        task = self._ainflight[key] = asyncio.get_running_loop().create_task(self._acompute(key, fn, ttl_seconds))
+        self._compute_tasks.add(task)
+        # avoid "exception was never retrieved" when nobody else was waiting
+        task.add_done_callback(lambda t: self._compute_tasks.discard(t) or t.cancelled() or t.exception())
+        return task
+
+    async def _acompute(self, key: str, fn: Callable[[], Awaitable[Any]], ttl_seconds: TTL) -> _CacheItem:
+        try:
+            value = await fn()
+            # encoding (orjson + gzip/brotli), size estimate and the write-through
+            # (SQLite lock + pickling) are all CPU / blocking work: keep them off the loop
+            return await asyncio.to_thread(self._set, key, value, ttl_seconds)
+        finally:
+            self._ainflight.pop(key, None)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._remove(key)
+        if self.backend is not None:
+            self.backend.delete(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._store.clear()
+            self._bytes = 0
+
+    def sweep(self) -> int:
+        """Drop every expired entry, returns how many were removed."""
+        now = time.time()
+        with self._lock:
+            expired = [
+                k for k, item in self._store.items()
+                if now >= item.expires_at + self.stale_grace_seconds
+            ]
+            for k in expired:
+                self._remove(k)
+        if self.backend is not None:
+            self.backend.sweep(now - self.stale_grace_seconds)
+        return len(expired)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._store),
+                "approx_bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "backend": type(self.backend).__name__ if self.backend is not None else None,
+            }
+
+    def _lookup(self, key: str, allow_stale: bool = True) -> _CacheItem | None:
+        """
+        Return the item while it is fresh or, with `allow_stale`, inside the
+        stale grace window. Only returned items count as hits.
+        """
+        now = time.time()
+        item, decided = self._lookup_local(key, allow_stale, now)
+        if decided:
+            return item
+        return self._count_backend(self._lookup_backend(key), allow_stale, now)
+
+    async def _alookup(self, key: str) -> _CacheItem | None:
+        """`_lookup` for the event loop: the shared tier (SQLite + unpickle) is read in a thread."""
+        now = time.time()
+        item, decided = self._lookup_local(key, True, now)
+        if decided:
+            return item
+        # the SQLite lock is shared with the other workers and may be held for up to its timeout
+        found = await asyncio.to_thread(self._lookup_backend, key) if self.backend is not None else None
+        return self._count_backend(found, True, now)
+
+    def _lookup_local(self, key: str, allow_stale: bool, now: float) -> tuple[_CacheItem | None, bool]:
+        """L1 part of a lookup; the flag is False when the shared tier still has to be asked."""
+        with self._lock:
+            item = self._store.get(key)
+            if item and now >= item.expires_at + self.stale_grace_seconds:
+                self._remove(key)
+                item = None
+            if item is None:
+                return None, False
+            if not allow_stale and now >= item.expires_at:
+                # kept for async callers that may still serve it stale
+                self.misses += 1
+                return None, True
+            self._store.move_to_end(key)
+            item.hits += 1
+            self.hits += 1
+            return item, True
+
+    def _count_backend(self, item: _CacheItem | None, allow_stale: bool, now: float) -> _CacheItem | None:
+        with self._lock:
+            if item is not None and (allow_stale or now < item.expires_at):
+                item.hits += 1
+                self.hits += 1
+                return item
+            self.misses += 1
+        return None
+
+    def _lookup_backend(self, key: str) -> _CacheItem | None:
+        if self.backend is None:
+            return None
+        row = self.backend.get(key)
+        if row is None:
             return None
-        if time.time() >= item.expires_at:
-            self._store.pop(key, None)
+        stored_at, expires_at, payload = row
+        if time.time() >= expires_at + self.stale_grace_seconds:
             return None
-        return item.value
+        if isinstance(payload, _BackendEntry):
+            value, encoded = payload.value, payload.encoded
+        else:
+            # rows written before the encoded body was stored alongside
+            value, encoded = payload, None
+        item = self._put_local(key, value, stored_at=stored_at, expires_at=expires_at, encoded=encoded)
+        self._ensure_sweeper()
+        return item
+
+    def _remove(self, key: str) -> None:
+        item = self._store.pop(key, None)
+        if item:
+            self._bytes -= item.size
+
+    def _evict(self) -> None:
+        while self._store and (
+            (self.max_entries and len(self._store) > self.max_entries)
+            or (self.max_bytes and self._bytes > self.max_bytes)
+        ):
+            _, item = self._store.popitem(last=False)
+            self._bytes -= item.size
+            self.evictions += 1
 
-    def set(self, key: str, value: Any, ttl_seconds: int) -> None:
-        self._store[key] = _CacheItem(expires_at=time.time() + ttl_seconds, value=value)
\ No newline at end of file
+    def _ensure_sweeper(self) -> None:
+        if self.sweep_interval_seconds <= 0 or self._sweeper is not None:
+            return
+        with self._lock:
+            if self._sweeper is not None:
+                return
+            self._sweeper = threading.Thread(
+                target=_sweep_loop,
+                args=(weakref.ref(self), self.sweep_interval_seconds),
+                name="ttlcache-sweeper",
+                daemon=True,
+            )
+            self._sweeper.start()
@@ -0,0 +1,98 @@
+import os
+import pickle
+import stat
+from typing import Any, Protocol
+
+from app.core.config import settings
+from app.core.sqlite_db import SQLiteDB
+
+
+class CacheBackend(Protocol):
+    """Shared (L2) tier behind TTLCache. Rows are `(stored_at, expires_at, value)`."""
+
+    def get(self, key: str) -> tuple[float, float, Any] | None: ...
+
+    def set(self, key: str, value: Any, stored_at: float, expires_at: float) -> None: ...
+
+    def delete(self, key: str) -> None: ...
+
+    def sweep(self, before: float) -> int: ...
+
+
+def ensure_private_dir(path: str) -> None:
+    """
+    Create `path` (mode 0700) and refuse to use it when it is not a real
+    directory owned by this user or when others can write into it: whoever
+    can plant the SQLite file controls what gets unpickled.
+    """
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    if not hasattr(os, "getuid"):
+        return
+    st = os.lstat(path)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or st.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+        raise PermissionError(
+            f"Refusing cache directory {path!r}: it must be a directory owned by uid {os.getuid()} "
+            "and not writable by group/others"
+        )
+
+
+class SQLiteBackend:
+    """
+    Host-local cache tier shared by every uvicorn worker through one SQLite
+    file (see `SQLiteDB`; failures read as misses). Values are pickled.
+    """
+
+    def __init__(self, path: str, namespace: str) -> None:
+        self.path = path
+        self.namespace = namespace
+        ensure_private_dir(os.path.dirname(os.path.abspath(path)))
+        self.db = SQLiteDB(
+            path,
+            schema=(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                " ns TEXT NOT NULL, key TEXT NOT NULL,"
+                " stored_at REAL NOT NULL, expires_at REAL NOT NULL, value BLOB NOT NULL,"
+                " PRIMARY KEY (ns, key))",
+                "CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires_at)",
+            ),
+        )
+        # fail at startup, not on the first request, when the file can't be opened
+        self.db.conn()
+
+    def get(self, key: str) -> tuple[float, float, Any] | None:
+        row = self.db.fetchone(
+            "SELECT stored_at, expires_at, value FROM cache WHERE ns = ? AND key = ?", (self.namespace, key)
+        )
+        if row is None:
+            return None
+        try:
+            return row[0], row[1], pickle.loads(row[2])
+        except (pickle.PickleError, EOFError, AttributeError):
+            return None
+
+    def set(self, key: str, value: Any, stored_at: float, expires_at: float) -> None:
+        try:
+            blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except (pickle.PickleError, TypeError, AttributeError):
+            return
+        self.db.execute(
+            "INSERT OR REPLACE INTO cache (ns, key, stored_at, expires_at, value) VALUES (?, ?, ?, ?, ?)",
+            (self.namespace, key, stored_at, expires_at, blob),
+        )
+
+    def delete(self, key: str) -> None:
+        self.db.execute("DELETE FROM cache WHERE ns = ? AND key = ?", (self.namespace, key))
+
+    def sweep(self, before: float) -> int:
+        cur = self.db.execute("DELETE FROM cache WHERE ns = ? AND expires_at <= ?", (self.namespace, before))
+        return cur.rowcount if cur is not None else 0
+
+
+def make_backend(namespace: str) -> CacheBackend | None:
+    """Build the shared tier configured in Settings (`CACHE_BACKEND`), None = in-process only."""
+    kind = settings.cache_backend.strip().lower()
+    if kind in ("", "memory"):
+        return None
+    if kind == "sqlite":
+        return SQLiteBackend(settings.cache_sqlite_path, namespace)
+    raise ValueError(f"Unknown CACHE_BACKEND: {settings.cache_backend!r} (expected 'memory' or 'sqlite')")
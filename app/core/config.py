@@ -1,7 +1,30 @@
-from pydantic import Field
+import getpass
+import os
+import tempfile
+
+from pydantic import BaseModel, ConfigDict, Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
+def _private_tmp_dir() -> str:
+    # per user: nama tetap di /tmp bisa dibuat duluan oleh user lain (isinya di-unpickle)
+    owner = os.getuid() if hasattr(os, "getuid") else getpass.getuser()
+    return os.path.join(tempfile.gettempdir(), f"personal-tools-api-{owner}")
+
+
+class HttpClientOverrides(BaseModel):
+    """Settings of one upstream's pooled client; unset fields fall back to the global HTTP_* values."""
+
+    model_config = ConfigDict(extra="forbid")
+
+    timeout_seconds: float | None = None
+    connect_timeout_seconds: float | None = None
+    max_connections: int | None = None
+    max_keepalive_connections: int | None = None
+    keepalive_expiry_seconds: float | None = None
+    http2: bool | None = None
+
+
 class Settings(BaseSettings):
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8")
 
@@ -11,6 +34,133 @@ class Settings(BaseSettings):
     bmkg_cache_ttl_seconds: int = Field(default=30, alias="BMKG_CACHE_TTL_SECONDS")
     ytdlp_cache_ttl_seconds: int = Field(default=15, alias="YTDLP_CACHE_TTL_SECONDS")
 
+    # tier cache bersama antar worker: "memory" (per proses) atau "sqlite" (satu file per host)
+    cache_backend: str = Field(default="memory", alias="CACHE_BACKEND")
+    cache_sqlite_path: str = Field(
+        default=os.path.join(_private_tmp_dir(), "cache.sqlite3"),
+        alias="CACHE_SQLITE_PATH",
+    )
+
+    # POST /api/utils/hash: ukuran buffer baca + upload di atas ini di-hash di thread
+    hash_chunk_bytes: int = Field(default=1024 * 1024, alias="HASH_CHUNK_BYTES")
+    hash_thread_min_bytes: int = Field(default=1024 * 1024, alias="HASH_THREAD_MIN_BYTES")
+
+    # cache hasil di disk (remove-bg, /api/convert/*), di-key SHA-256 input + parameter
+    result_cache_enabled: bool = Field(default=True, alias="RESULT_CACHE_ENABLED")
+    result_cache_dir: str = Field(
+        default=os.path.join(tempfile.gettempdir(), "personal-tools-api-results"),
+        alias="RESULT_CACHE_DIR",
+    )
+    result_cache_max_bytes: int = Field(default=1024 * 1024 * 1024, alias="RESULT_CACHE_MAX_BYTES")
+
+    # batas memori cache per instance (0 = tanpa batas)
+    cache_sweep_interval_seconds: int = Field(default=60, alias="CACHE_SWEEP_INTERVAL_SECONDS")
+    bmkg_cache_max_entries: int = Field(default=16, alias="BMKG_CACHE_MAX_ENTRIES")
+    bmkg_cache_max_bytes: int = Field(default=1024 * 1024, alias="BMKG_CACHE_MAX_BYTES")
+    # stale-while-revalidate: sajikan data lama selama grace window sambil refresh di background
+    bmkg_cache_stale_grace_seconds: int = Field(default=120, alias="BMKG_CACHE_STALE_GRACE_SECONDS")
+    bmkg_cache_refresh_ahead_seconds: int = Field(default=5, alias="BMKG_CACHE_REFRESH_AHEAD_SECONDS")
+    ytdlp_cache_max_entries: int = Field(default=512, alias="YTDLP_CACHE_MAX_ENTRIES")
+    ytdlp_cache_max_bytes: int = Field(default=64 * 1024 * 1024, alias="YTDLP_CACHE_MAX_BYTES")
+
+    # process pool untuk ekstraksi yt-dlp
+    ytdlp_workers: int = Field(default=2, alias="YTDLP_WORKERS")
+    ytdlp_max_queue: int = Field(default=16, alias="YTDLP_MAX_QUEUE")
+    ytdlp_job_timeout_seconds: float = Field(default=60.0, alias="YTDLP_JOB_TIMEOUT_SECONDS")
+    ytdlp_retry_after_seconds: int = Field(default=5, alias="YTDLP_RETRY_AFTER_SECONDS")
+    # TTL cache /direct ikut masa berlaku URL bertanda tangan (dikurangi margin, dibatasi max)
+    ytdlp_direct_ttl_max_seconds: int = Field(default=6 * 3600, alias="YTDLP_DIRECT_TTL_MAX_SECONDS")
+    ytdlp_direct_expiry_margin_seconds: int = Field(default=300, alias="YTDLP_DIRECT_EXPIRY_MARGIN_SECONDS")
+    # memo URL -> (extractor, video id) untuk cache key
+    ytdlp_canonical_cache_size: int = Field(default=4096, alias="YTDLP_CANONICAL_CACHE_SIZE")
+    ytdlp_batch_max_urls: int = Field(default=50, alias="YTDLP_BATCH_MAX_URLS")
+    ytdlp_batch_concurrency: int = Field(default=4, alias="YTDLP_BATCH_CONCURRENCY")
+
+    # proxy /api/dl/stream
+    stream_max_concurrent: int = Field(default=8, alias="STREAM_MAX_CONCURRENT")
+    stream_chunk_bytes: int = Field(default=64 * 1024, alias="STREAM_CHUNK_BYTES")
+
+    # rembg: model + pool session ONNX (thread 0 = default onnxruntime)
+    rembg_model: str = Field(default="u2net", alias="REMBG_MODEL")
+    rembg_sessions: int = Field(default=1, alias="REMBG_SESSIONS")
+    rembg_intra_op_threads: int = Field(default=0, alias="REMBG_INTRA_OP_THREADS")
+    rembg_inter_op_threads: int = Field(default=0, alias="REMBG_INTER_OP_THREADS")
+    rembg_preload: bool = Field(default=True, alias="REMBG_PRELOAD")
+
+    # pool thread untuk inference gambar (sebaiknya <= REMBG_SESSIONS)
+    image_workers: int = Field(default=1, alias="IMAGE_WORKERS")
+    image_max_queue: int = Field(default=8, alias="IMAGE_MAX_QUEUE")
+    image_job_timeout_seconds: float = Field(default=60.0, alias="IMAGE_JOB_TIMEOUT_SECONDS")
+    image_retry_after_seconds: int = Field(default=3, alias="IMAGE_RETRY_AFTER_SECONDS")
+    # /api/img/remove-bg/batch: jumlah gambar per inference ONNX
+    image_batch_size: int = Field(default=8, alias="IMAGE_BATCH_SIZE")
+    image_batch_max_images: int = Field(default=100, alias="IMAGE_BATCH_MAX_IMAGES")
+    image_batch_fetch_concurrency: int = Field(default=8, alias="IMAGE_BATCH_FETCH_CONCURRENCY")
+
+    islamic_cache_ttl_seconds: int = Field(default=6 * 3600, alias="ISLAMIC_CACHE_TTL_SECONDS")
+    islamic_cache_max_entries: int = Field(default=256, alias="ISLAMIC_CACHE_MAX_ENTRIES")
+    islamic_cache_max_bytes: int = Field(default=32 * 1024 * 1024, alias="ISLAMIC_CACHE_MAX_BYTES")
+
+    # job converter (/api/convert/*): process pool + batas per tipe
+    convert_workers: int = Field(default=2, alias="CONVERT_WORKERS")
+    convert_pdf_concurrency: int = Field(default=1, alias="CONVERT_PDF_CONCURRENCY")
+    convert_audio_concurrency: int = Field(default=2, alias="CONVERT_AUDIO_CONCURRENCY")
+    convert_gif_concurrency: int = Field(default=1, alias="CONVERT_GIF_CONCURRENCY")
+    convert_max_pending_jobs: int = Field(default=32, alias="CONVERT_MAX_PENDING_JOBS")
+    convert_job_timeout_seconds: float = Field(default=900.0, alias="CONVERT_JOB_TIMEOUT_SECONDS")
+    convert_job_ttl_seconds: int = Field(default=3600, alias="CONVERT_JOB_TTL_SECONDS")
+    convert_retry_after_seconds: int = Field(default=10, alias="CONVERT_RETRY_AFTER_SECONDS")
+
+    # video-to-gif: default + batas keras (nilai dari request di-clamp ke sini)
+    gif_default_fps: int = Field(default=10, alias="GIF_DEFAULT_FPS")
+    gif_max_fps: int = Field(default=20, alias="GIF_MAX_FPS")
+    gif_default_width: int = Field(default=480, alias="GIF_DEFAULT_WIDTH")
+    gif_max_width: int = Field(default=720, alias="GIF_MAX_WIDTH")
+    gif_max_duration_seconds: float = Field(default=15.0, alias="GIF_MAX_DURATION_SECONDS")
+
+    # pdf-to-word: halaman dibagi ke beberapa proses parser
+    pdf_workers: int = Field(default=2, alias="PDF_WORKERS")
+    pdf_pages_per_worker: int = Field(default=8, alias="PDF_PAGES_PER_WORKER")
+    pdf_max_pages: int = Field(default=300, alias="PDF_MAX_PAGES")
+
+    # cache gambar QR hasil encode (per text + opsi)
+    qr_cache_ttl_seconds: int = Field(default=24 * 3600, alias="QR_CACHE_TTL_SECONDS")
+    qr_cache_max_entries: int = Field(default=2048, alias="QR_CACHE_MAX_ENTRIES")
+    qr_cache_max_bytes: int = Field(default=32 * 1024 * 1024, alias="QR_CACHE_MAX_BYTES")
+    qr_batch_max_items: int = Field(default=500, alias="QR_BATCH_MAX_ITEMS")
+
+    # pool koneksi HTTP keluar (lihat app/core/http_clients.py)
+    http_timeout_seconds: float = Field(default=30.0, alias="HTTP_TIMEOUT_SECONDS")
+    http_connect_timeout_seconds: float = Field(default=10.0, alias="HTTP_CONNECT_TIMEOUT_SECONDS")
+    http_max_connections: int = Field(default=100, alias="HTTP_MAX_CONNECTIONS")
+    http_max_keepalive_connections: int = Field(default=20, alias="HTTP_MAX_KEEPALIVE_CONNECTIONS")
+    http_keepalive_expiry_seconds: float = Field(default=30.0, alias="HTTP_KEEPALIVE_EXPIRY_SECONDS")
+    http_http2: bool = Field(default=True, alias="HTTP_HTTP2")
+    # override per upstream (nama client: default, copilot, ocr, islamic, media, fetch), JSON di env;
+    # mengisi variabel ini mengganti default di bawah
+    http_upstreams: dict[str, HttpClientOverrides] = Field(
+        default_factory=lambda: {
+            "copilot": HttpClientOverrides(timeout_seconds=60.0),
+            "ocr": HttpClientOverrides(timeout_seconds=60.0),
+        },
+        alias="HTTP_UPSTREAMS",
+    )
+
+    # unduhan URL dari user (remove-bg-by-url, batch, OCR, Gemini)
+    fetch_max_bytes: int = Field(default=20 * 1024 * 1024, alias="FETCH_MAX_BYTES")
+    fetch_timeout_seconds: float = Field(default=30.0, alias="FETCH_TIMEOUT_SECONDS")
+    fetch_per_host_concurrency: int = Field(default=4, alias="FETCH_PER_HOST_CONCURRENCY")
+    fetch_max_image_pixels: int = Field(default=64_000_000, alias="FETCH_MAX_IMAGE_PIXELS")
+    fetch_image_header_bytes: int = Field(default=256 * 1024, alias="FETCH_IMAGE_HEADER_BYTES")
+
+    # conditional GET (ETag / Last-Modified) untuk feed JSON upstream
+    http_revalidate_retention_seconds: int = Field(default=24 * 3600, alias="HTTP_REVALIDATE_RETENTION_SECONDS")
+    http_revalidate_max_entries: int = Field(default=512, alias="HTTP_REVALIDATE_MAX_ENTRIES")
+    http_revalidate_max_bytes: int = Field(default=64 * 1024 * 1024, alias="HTTP_REVALIDATE_MAX_BYTES")
+
+    # body cache hit di atas ukuran ini disimpan juga versi gzip/brotli-nya
+    response_compress_min_bytes: int = Field(default=1024, alias="RESPONSE_COMPRESS_MIN_BYTES")
+
 
 settings = Settings()
 
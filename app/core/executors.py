@@ -0,0 +1,209 @@
+import asyncio
+import functools
+import multiprocessing
+import pickle
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Awaitable, Callable
+
+from fastapi import HTTPException
+
+
+class WorkerError(Exception):
+    """An exception from a worker process that could not be pickled back as-is."""
+
+
+def _call_in_worker(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    try:
+        return fn(*args, **kwargs)
+    except Exception as e:
+        # misal DownloadError yt-dlp bawa traceback/logger yang tidak bisa di-pickle
+        try:
+            pickle.dumps(e)
+        except Exception:
+            raise WorkerError(str(e)) from None
+        raise
+
+
+def _warmup(delay: float) -> None:
+    # cukup bikin worker hidup (initializer jalan di sini)
+    time.sleep(delay)
+
+
+class BoundedExecutor:
+    """
+    Runs blocking jobs outside the event loop (process or thread pool) with
+    back-pressure: at most `max_concurrency` jobs run at once, at most
+    `max_queue` more may wait for a slot, and anything beyond that is shed
+    with 503 + `Retry-After`. A job that exceeds `timeout_seconds` answers
+    504; its slot is only released once the worker really finishes, so the
+    concurrency cap keeps holding even for runaway jobs.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        kind: str,
+        max_concurrency: int,
+        max_queue: int,
+        timeout_seconds: float,
+        retry_after_seconds: int = 5,
+        initializer: Callable[[], None] | None = None,
+    ) -> None:
+        if kind not in ("process", "thread"):
+            raise ValueError("kind must be 'process' or 'thread'")
+        self.name = name
+        self.kind = kind
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.timeout_seconds = timeout_seconds
+        self.retry_after_seconds = retry_after_seconds
+        self.initializer = initializer
+        self._executor: Executor | None = None
+        self._sem: asyncio.Semaphore | None = None
+        self._waiting = 0
+        self._running = 0
+        self.completed = 0  # semua job yang sudah selesai jalan, termasuk yang gagal / timeout
+        self.failed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.queue_wait_total = 0.0
+        self.run_total = 0.0
+
+    def _ensure_executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_concurrency,
+                    # spawn: jangan fork proses uvicorn yang sudah punya thread/event loop
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=self.initializer,
+                )
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_concurrency,
+                    thread_name_prefix=self.name,
+                    initializer=self.initializer,
+                )
+        return self._executor
+
+    def start(self) -> None:
+        """Create the pool and spin up every worker now instead of on the first request."""
+        executor = self._ensure_executor()
+        for _ in range(self.max_concurrency):
+            executor.submit(_warmup, 0.2)
+
+    def shutdown(self) -> None:
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    async def run(
+        self,
+        fn: Callable[..., Any],
+        *args: Any,
+        on_start: Callable[[], Awaitable[Any]] | None = None,
+        **kwargs: Any,
+    ) -> Any:
+        result, _, _ = await self.run_timed(fn, *args, on_start=on_start, **kwargs)
+        return result
+
+    async def run_timed(
+        self,
+        fn: Callable[..., Any],
+        *args: Any,
+        on_start: Callable[[], Awaitable[Any]] | None = None,
+        **kwargs: Any,
+    ) -> tuple[Any, float, float]:
+        """
+        Like `run`, but returns `(result, queue_wait_seconds, run_seconds)`.
+        `on_start` is awaited once the job holds a worker slot, right before it
+        is submitted (e.g. to flip a job from queued to running).
+        """
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self.max_concurrency)
+        if self._sem.locked() and self._waiting >= self.max_queue:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=503,
+                detail={"ok": False, "error": f"{self.name} is busy, try again later"},
+                headers={"Retry-After": str(self.retry_after_seconds)},
+            )
+
+        queued_at = time.perf_counter()
+        self._waiting += 1
+        try:
+            await self._sem.acquire()
+        finally:
+            self._waiting -= 1
+        # worker pool seukuran semaphore, jadi job langsung jalan begitu dapat slot
+        started_at = time.perf_counter()
+        self.queue_wait_total += started_at - queued_at
+
+        sem = self._sem
+        self._running += 1
+
+        def _release(_f: Any) -> None:
+            self._running -= 1
+            sem.release()
+
+        loop = asyncio.get_running_loop()
+        try:
+            if on_start is not None:
+                await on_start()
+            if self.kind == "process":
+                call = functools.partial(_call_in_worker, fn, *args, **kwargs)
+            else:
+                call = functools.partial(fn, *args, **kwargs)
+            # dicatat supaya handler BrokenProcessPool tidak mematikan pool pengganti
+            executor = self._ensure_executor()
+            fut = loop.run_in_executor(executor, call)
+        except BaseException:
+            _release(None)
+            raise
+        fut.add_done_callback(_release)
+
+        failed = True
+        try:
+            result = await asyncio.wait_for(asyncio.shield(fut), timeout=self.timeout_seconds)
+            failed = False
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            # hasil yang datang belakangan dibuang saja
+            fut.add_done_callback(lambda f: f.cancelled() or f.exception())
+            raise HTTPException(
+                status_code=504,
+                detail={"ok": False, "error": f"{self.name} job timed out after {self.timeout_seconds:g}s"},
+            )
+        except BrokenProcessPool:
+            # worker mati (OOM/segfault): buang pool, request berikutnya bikin yang baru.
+            # Job lain di pool yang sama juga sampai sini; pool yang sudah diganti jangan ikut dimatikan
+            if self._executor is executor:
+                self.shutdown()
+            raise HTTPException(
+                status_code=503,
+                detail={"ok": False, "error": f"{self.name} worker crashed, try again"},
+                headers={"Retry-After": str(self.retry_after_seconds)},
+            )
+        finally:
+            run_seconds = time.perf_counter() - started_at
+            self.completed += 1
+            self.failed += failed
+            self.run_total += run_seconds
+        return result, started_at - queued_at, run_seconds
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "running": self._running,
+            "waiting": self._waiting,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "avg_queue_wait_ms": round(1000 * self.queue_wait_total / self.completed, 1) if self.completed else None,
+            "avg_run_ms": round(1000 * self.run_total / self.completed, 1) if self.completed else None,
+        }
@@ -0,0 +1,92 @@
+from typing import Any
+
+import httpx
+
+from app.core.config import HttpClientOverrides, settings
+
+try:
+    import h2  # type: ignore  # noqa: F401
+    HTTP2_AVAILABLE = True
+except Exception:
+    HTTP2_AVAILABLE = False
+
+
+
+class HttpClientRegistry:
+    """
+    One pooled `httpx.AsyncClient` per upstream, shared by every request so
+    TCP/TLS connections are kept alive and reused instead of re-handshaking.
+    Clients are created lazily and closed together in the app lifespan.
+    Timeouts, pool limits, keep-alive and HTTP/2 can be set per upstream
+    through `HTTP_UPSTREAMS`.
+    """
+
+    def __init__(self) -> None:
+        self._clients: dict[str, httpx.AsyncClient] = {}
+
+    def get(self, name: str = "default") -> httpx.AsyncClient:
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            client = self._clients[name] = self._build(name)
+        return client
+
+    @staticmethod
+    def config(name: str) -> dict[str, Any]:
+        """Effective settings of upstream `name` (its HTTP_UPSTREAMS entry over the global values)."""
+        overrides = settings.http_upstreams.get(name) or HttpClientOverrides()
+        defaults = {
+            "timeout_seconds": settings.http_timeout_seconds,
+            "connect_timeout_seconds": settings.http_connect_timeout_seconds,
+            "max_connections": settings.http_max_connections,
+            "max_keepalive_connections": settings.http_max_keepalive_connections,
+            "keepalive_expiry_seconds": settings.http_keepalive_expiry_seconds,
+            "http2": settings.http_http2,
+        }
+        out = {key: value if (value := getattr(overrides, key)) is not None else default
+               for key, default in defaults.items()}
+        out["http2"] = out["http2"] and HTTP2_AVAILABLE
+        return out
+
+    def _build(self, name: str) -> httpx.AsyncClient:
+        cfg = self.config(name)
+        return httpx.AsyncClient(
+            timeout=httpx.Timeout(cfg["timeout_seconds"], connect=cfg["connect_timeout_seconds"]),
+            limits=httpx.Limits(
+                max_connections=cfg["max_connections"],
+                max_keepalive_connections=cfg["max_keepalive_connections"],
+                keepalive_expiry=cfg["keepalive_expiry_seconds"],
+            ),
+            http2=cfg["http2"],
+            follow_redirects=True,
+        )
+
+    async def aclose(self) -> None:
+        clients, self._clients = self._clients, {}
+        for client in clients.values():
+            await client.aclose()
+
+    def stats(self) -> dict[str, Any]:
+        out: dict[str, Any] = {}
+        for name, client in self._clients.items():
+            # httpcore keeps the pool on the transport; not public API, so read it defensively
+            pool = getattr(getattr(client, "_transport", None), "_pool", None)
+            connections = list(getattr(pool, "connections", []) or [])
+            out[name] = {
+                "config": self.config(name),
+                "closed": client.is_closed,
+                "connections": len(connections),
+                "idle": sum(1 for c in connections if c.is_idle()),
+                "http2": sum(1 for c in connections if "HTTP/2" in c.info()),
+                "queued_requests": sum(
+                    1 for r in getattr(pool, "_requests", []) or [] if getattr(r, "connection", None) is None
+                ),
+            }
+        return {
+            "http2_enabled": settings.http_http2 and HTTP2_AVAILABLE,
+            "max_connections": settings.http_max_connections,
+            "max_keepalive_connections": settings.http_max_keepalive_connections,
+            "clients": out,
+        }
+
+
+http_clients = HttpClientRegistry()
@@ -0,0 +1,222 @@
+import asyncio
+import hashlib
+import io
+import os
+import tempfile
+from dataclasses import dataclass
+from typing import Any
+from urllib.parse import urlsplit
+
+import httpx
+from fastapi import HTTPException
+from PIL import Image
+
+from app.core.config import settings
+from app.core.http_clients import http_clients
+
+IMAGE_TYPES = ("image/",)
+# banyak CDN/bucket kirim gambar sebagai octet-stream; isinya tetap dicek lewat header gambar
+_GENERIC_TYPES = ("application/octet-stream", "binary/octet-stream")
+
+
+@dataclass
+class RemoteFile:
+    url: str
+    content_type: str
+    size: int
+    sha256: str
+    content: bytes | None = None
+    path: str | None = None
+    image_format: str | None = None
+    image_size: tuple[int, int] | None = None
+
+
+def _error(status_code: int, message: str) -> HTTPException:
+    return HTTPException(status_code=status_code, detail={"ok": False, "error": message})
+
+
+class RemoteFetcher:
+    """
+    Downloads user-supplied URLs without trusting them: `Content-Length` and
+    `Content-Type` are checked before the body is read, the body is streamed
+    under a hard byte cap and an overall deadline, and each remote host gets
+    a small concurrency limit so one slow host can't hog the pool.
+
+    Image headers are parsed incrementally while the body streams, so a file
+    that is not an image (or declares absurd dimensions) is rejected before
+    it is fully downloaded. Pixel decoding is left to the caller's worker,
+    off the event loop and able to use `draft()`.
+    """
+
+    def __init__(self, client_name: str = "fetch") -> None:
+        self.client_name = client_name
+        self._host_sems: dict[str, asyncio.Semaphore] = {}
+        self.fetched = 0
+        self.rejected = 0
+        self.bytes_in = 0
+
+    def _host_sem(self, url: str) -> asyncio.Semaphore:
+        host = (urlsplit(url).hostname or "").lower()
+        sem = self._host_sems.get(host)
+        if sem is None:
+            sem = self._host_sems[host] = asyncio.Semaphore(settings.fetch_per_host_concurrency)
+        return sem
+
+    def _check_headers(self, r: httpx.Response, max_bytes: int, allowed_types: tuple[str, ...]) -> str:
+        if r.status_code >= 400:
+            raise _error(400, f"Remote returned HTTP {r.status_code}")
+        content_type = r.headers.get("content-type", "").split(";")[0].strip().lower()
+        if allowed_types and content_type and not content_type.startswith(allowed_types + _GENERIC_TYPES):
+            raise _error(415, f"Unsupported content type: {content_type}")
+        length = r.headers.get("content-length")
+        if length and length.isdigit() and int(length) > max_bytes:
+            raise _error(413, f"Remote file is {int(length)} bytes, limit is {max_bytes}")
+        return content_type
+
+    async def fetch(
+        self,
+        url: str,
+        *,
+        max_bytes: int | None = None,
+        allowed_types: tuple[str, ...] = IMAGE_TYPES,
+        image: bool = True,
+        to_file: bool = False,
+        suffix: str = "",
+    ) -> RemoteFile:
+        """
+        Stream `url` into memory (or a temp file with `to_file`, caller deletes it).
+        Raises HTTPException: 400 bad URL/upstream error, 413 too large,
+        415 wrong type / not an image, 504 deadline exceeded.
+        """
+        if urlsplit(url).scheme not in ("http", "https"):
+            raise _error(400, "Only http(s) URLs are supported")
+        max_bytes = max_bytes or settings.fetch_max_bytes
+        try:
+            async with self._host_sem(url):
+                result = await asyncio.wait_for(
+                    self._download(url, max_bytes, allowed_types, image, to_file, suffix),
+                    timeout=settings.fetch_timeout_seconds,
+                )
+        except HTTPException:
+            self.rejected += 1
+            raise
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise _error(504, f"Fetching remote file took longer than {settings.fetch_timeout_seconds:g}s")
+        except httpx.HTTPError as e:
+            self.rejected += 1
+            raise _error(400, f"Failed to fetch remote file: {e}")
+        self.fetched += 1
+        self.bytes_in += result.size
+        return result
+
+    async def _download(
+        self,
+        url: str,
+        max_bytes: int,
+        allowed_types: tuple[str, ...],
+        image: bool,
+        to_file: bool,
+        suffix: str,
+    ) -> RemoteFile:
+        client = http_clients.get(self.client_name)
+        h = hashlib.sha256()
+        head = bytearray()
+        identified: Image.Image | None = None
+        chunks: list[bytes] = []
+        size = 0
+        fd, path = tempfile.mkstemp(suffix=suffix) if to_file else (None, None)
+        out = os.fdopen(fd, "wb") if fd is not None else None
+        try:
+            async with client.stream("GET", url) as r:
+                content_type = self._check_headers(r, max_bytes, allowed_types)
+                async for chunk in r.aiter_bytes():
+                    size += len(chunk)
+                    if size > max_bytes:
+                        raise _error(413, f"Remote file exceeds limit of {max_bytes} bytes")
+                    h.update(chunk)
+                    if out is not None:
+                        out.write(chunk)
+                    else:
+                        chunks.append(chunk)
+                    if image and identified is None:
+                        head += chunk
+                        identified = self._identify(head)
+            if out is not None:
+                out.close()
+                out = None
+        except BaseException:
+            if out is not None:
+                out.close()
+            if path is not None:
+                os.remove(path)
+            raise
+
+        result = RemoteFile(url=url, content_type=content_type, size=size, sha256=h.hexdigest(), path=path)
+        if path is None:
+            result.content = b"".join(chunks)
+        if image:
+            if identified is None:
+                if path is not None:
+                    os.remove(path)
+                raise _error(415, "Remote file is not a supported image")
+            result.image_format = identified.format
+            result.image_size = identified.size
+            if path is not None and not suffix and identified.format:
+                # ekstensi ikut format asli, beberapa library menebak MIME dari nama file
+                result.path = f"{path}.{identified.format.lower()}"
+                os.replace(path, result.path)
+        return result
+
+    @staticmethod
+    def _identify(head: bytearray) -> Image.Image | None:
+        """Try to read the image header from the bytes received so far (no pixels are decoded)."""
+        try:
+            im = Image.open(io.BytesIO(bytes(head)))
+        except Image.DecompressionBombError as e:
+            raise _error(413, str(e))
+        except Exception:
+            if len(head) > settings.fetch_image_header_bytes:
+                raise _error(415, "Remote file is not a supported image")
+            return None
+        width, height = im.size
+        if width * height > settings.fetch_max_image_pixels:
+            raise _error(413, f"Image is {width}x{height}, limit is {settings.fetch_max_image_pixels} pixels")
+        return im
+
+    async def probe(
+        self, url: str, *, max_bytes: int | None = None, allowed_types: tuple[str, ...] = IMAGE_TYPES
+    ) -> dict[str, Any]:
+        """Validate type/size from response headers only (HEAD, or a GET closed before the body)."""
+        if urlsplit(url).scheme not in ("http", "https"):
+            raise _error(400, "Only http(s) URLs are supported")
+        max_bytes = max_bytes or settings.fetch_max_bytes
+        client = http_clients.get(self.client_name)
+        try:
+            async with self._host_sem(url):
+                r = await client.head(url)
+                if r.status_code in (403, 405, 501):
+                    # server yang tidak dukung HEAD
+                    async with client.stream("GET", url) as r:
+                        content_type = self._check_headers(r, max_bytes, allowed_types)
+                else:
+                    content_type = self._check_headers(r, max_bytes, allowed_types)
+        except HTTPException:
+            self.rejected += 1
+            raise
+        except httpx.HTTPError as e:
+            self.rejected += 1
+            raise _error(400, f"Failed to fetch remote file: {e}")
+        length = r.headers.get("content-length")
+        return {"content_type": content_type, "size": int(length) if length and length.isdigit() else None}
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "fetched": self.fetched,
+            "rejected": self.rejected,
+            "bytes_in": self.bytes_in,
+            "hosts": len(self._host_sems),
+        }
+
+
+remote_fetcher = RemoteFetcher()
@@ -0,0 +1,113 @@
+import gzip
+import os
+from dataclasses import dataclass
+from typing import Any, BinaryIO, Callable, Iterator
+from urllib.parse import quote
+
+import orjson
+from fastapi import Request
+from fastapi.responses import Response, StreamingResponse
+
+from app.core.config import settings
+
+try:
+    import brotli  # type: ignore
+    BROTLI_AVAILABLE = True
+except Exception:
+    brotli = None
+    BROTLI_AVAILABLE = False
+
+
+def dumps(obj: Any) -> bytes:
+    return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+
+
+@dataclass(frozen=True)
+class EncodedBody:
+    """
+    JSON bytes kept next to a cached value so hits skip encoding entirely.
+
+    `data` is the encoded value alone (spliced into per-request envelopes),
+    `hit` is the full body served on a cache hit, optionally with compressed
+    copies when it is large enough to be worth it.
+    """
+
+    data: bytes
+    hit: bytes
+    hit_gzip: bytes | None = None
+    hit_br: bytes | None = None
+
+
+def envelope(data: bytes, **fields: Any) -> bytes:
+    """Build `{**fields, "data": <data>}` around already-encoded data without re-encoding it."""
+    if not fields:
+        return data
+    head = dumps(fields)
+    return head[:-1] + b',"data":' + data + b"}"
+
+
+def make_encoder(**hit_fields: Any) -> Callable[[Any], EncodedBody]:
+    """Encoder for `TTLCache(encoder=...)`; `hit_fields` wrap the data in the hit body (none = raw data)."""
+
+    def encode(value: Any) -> EncodedBody:
+        data = dumps(value)
+        hit = envelope(data, **hit_fields)
+        hit_gzip = hit_br = None
+        if len(hit) >= settings.response_compress_min_bytes:
+            hit_gzip = gzip.compress(hit, compresslevel=6)
+            if BROTLI_AVAILABLE:
+                hit_br = brotli.compress(hit, quality=5)
+        return EncodedBody(data=data, hit=hit, hit_gzip=hit_gzip, hit_br=hit_br)
+
+    return encode
+
+
+def json_bytes_response(body: bytes, status_code: int = 200, headers: dict[str, str] | None = None) -> Response:
+    return Response(content=body, status_code=status_code, media_type="application/json", headers=headers)
+
+
+def encoded_response(request: Request, encoded: EncodedBody, headers: dict[str, str] | None = None) -> Response:
+    """Serve the pre-encoded hit body, picking a pre-compressed copy the client accepts."""
+    headers = dict(headers or {})
+    accept = request.headers.get("accept-encoding", "")
+    body = encoded.hit
+    if encoded.hit_gzip is not None:
+        headers["Vary"] = "Accept-Encoding"
+        if encoded.hit_br is not None and "br" in accept:
+            body = encoded.hit_br
+            headers["Content-Encoding"] = "br"
+        elif "gzip" in accept:
+            body = encoded.hit_gzip
+            headers["Content-Encoding"] = "gzip"
+    return json_bytes_response(body, headers=headers)
+
+
+def _read_chunks(fh: BinaryIO, chunk_size: int) -> Iterator[bytes]:
+    try:
+        while chunk := fh.read(chunk_size):
+            yield chunk
+    finally:
+        fh.close()
+
+
+def open_file_response(
+    fh: BinaryIO,
+    media_type: str,
+    filename: str | None = None,
+    headers: dict[str, str] | None = None,
+    chunk_size: int = 256 * 1024,
+) -> StreamingResponse:
+    """
+    Stream an already-open file and close it at the end. Unlike `FileResponse`
+    this keeps working when the path is unlinked after the lookup (e.g. LRU
+    eviction in another worker), since the open handle still reads the data.
+    """
+    headers = dict(headers or {})
+    headers["Content-Length"] = str(os.fstat(fh.fileno()).st_size)
+    if filename:
+        quoted = quote(filename)
+        if quoted != filename:
+            headers["Content-Disposition"] = f"attachment; filename*=utf-8''{quoted}"
+        else:
+            headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return StreamingResponse(_read_chunks(fh, chunk_size), media_type=media_type, headers=headers)
@@ -0,0 +1,187 @@
+import hashlib
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import Any, BinaryIO
+
+from app.core.config import settings
+from app.core.sqlite_db import SQLiteDB
+
+
+@dataclass(frozen=True)
+class ResultEntry:
+    key: str
+    path: str
+    size: int
+    media_type: str
+
+
+class DiskResultCache:
+    """
+    Content-addressed store for expensive outputs (remove-bg PNGs, converted
+    documents/media). Keys are derived from the SHA-256 of the input plus the
+    operation and its parameters, files live in a two-level sharded directory
+    and an SQLite index (shared by every worker, survives restarts) tracks
+    size and last access for LRU eviction under `max_bytes`. Index or file
+    errors read as misses.
+    """
+
+    def __init__(self, root: str, max_bytes: int, enabled: bool = True) -> None:
+        self.root = root
+        # index bersama; tabel lain yang perlu dilihat semua worker (mis. job converter) ikut di sini
+        self.index_path = os.path.join(root, "index.sqlite3")
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.db = SQLiteDB(
+            self.index_path,
+            schema=(
+                "CREATE TABLE IF NOT EXISTS results ("
+                " key TEXT PRIMARY KEY, size INTEGER NOT NULL, media_type TEXT NOT NULL,"
+                " created_at REAL NOT NULL, last_access REAL NOT NULL)",
+                "CREATE INDEX IF NOT EXISTS results_lru ON results (last_access)",
+            ),
+        )
+
+    @staticmethod
+    def key(operation: str, input_sha256: str, **params: Any) -> str:
+        raw = "|".join([operation, input_sha256, *(f"{k}={params[k]}" for k in sorted(params))])
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key[2:4], key)
+
+    def get(self, key: str) -> ResultEntry | None:
+        if not self.enabled:
+            return None
+        try:
+            conn = self.db.conn()
+            row = conn.execute("SELECT size, media_type FROM results WHERE key = ?", (key,)).fetchone()
+            path = self._path(key)
+            if row is None or not os.path.exists(path):
+                if row is not None:
+                    # file hilang (dihapus manual / disk dibersihkan): buang index-nya
+                    conn.execute("DELETE FROM results WHERE key = ?", (key,))
+                self.misses += 1
+                return None
+            conn.execute("UPDATE results SET last_access = ? WHERE key = ?", (time.time(), key))
+        except (sqlite3.Error, OSError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return ResultEntry(key=key, path=path, size=row[0], media_type=row[1])
+
+    def open_entry(self, key: str) -> tuple[ResultEntry, BinaryIO] | None:
+        """
+        Like `get`, with the file already opened. The handle stays readable if
+        another worker evicts (unlinks) the file before it is served.
+        """
+        entry = self.get(key)
+        if entry is None:
+            return None
+        try:
+            return entry, open(entry.path, "rb")
+        except OSError:
+            # tergeser LRU worker lain antara lookup index dan open
+            self.hits -= 1
+            self.misses += 1
+            return None
+
+    def read(self, key: str) -> bytes | None:
+        entry = self.get(key)
+        if entry is None:
+            return None
+        try:
+            with open(entry.path, "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def put_file(self, key: str, src_path: str, media_type: str, move: bool = True) -> ResultEntry | None:
+        """Store an output file; with `move` the source is renamed into the cache when possible."""
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+            os.close(fd)
+            if move:
+                # rename antar filesystem gagal -> jatuh ke copy
+                shutil.move(src_path, tmp)
+            else:
+                shutil.copyfile(src_path, tmp)
+            os.replace(tmp, path)
+            return self._index(key, path, media_type)
+        except (sqlite3.Error, OSError):
+            return None
+
+    def put_bytes(self, key: str, data: bytes, media_type: str) -> ResultEntry | None:
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+            return self._index(key, path, media_type)
+        except (sqlite3.Error, OSError):
+            return None
+
+    def _index(self, key: str, path: str, media_type: str) -> ResultEntry:
+        size = os.path.getsize(path)
+        now = time.time()
+        self.db.conn().execute(
+            "INSERT OR REPLACE INTO results (key, size, media_type, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+            (key, size, media_type, now, now),
+        )
+        self._evict(keep=key)
+        return ResultEntry(key=key, path=path, size=size, media_type=media_type)
+
+    def _evict(self, keep: str) -> None:
+        if self.max_bytes <= 0:
+            return
+        conn = self.db.conn()
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in conn.execute(
+            "SELECT key, size FROM results WHERE key != ? ORDER BY last_access", (keep,)
+        ).fetchall():
+            conn.execute("DELETE FROM results WHERE key = ?", (key,))
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+            self.evictions += 1
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def stats(self) -> dict[str, Any]:
+        out: dict[str, Any] = {
+            "enabled": self.enabled,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+        if self.enabled:
+            row = self.db.fetchone("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results")
+            if row is not None:
+                out.update(entries=row[0], bytes=row[1])
+        return out
+
+
+result_cache = DiskResultCache(
+    settings.result_cache_dir,
+    max_bytes=settings.result_cache_max_bytes,
+    enabled=settings.result_cache_enabled,
+)
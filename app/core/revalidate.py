@@ -0,0 +1,68 @@
+from dataclasses import dataclass
+from typing import Any
+
+import httpx
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+
+@dataclass
+class _Validated:
+    data: Any
+    etag: str | None
+    last_modified: str | None
+
+
+# validator + objek hasil parse disimpan lebih lama dari TTL cache route,
+# supaya setelah TTL habis cukup kirim conditional GET
+_validators = TTLCache(
+    max_entries=settings.http_revalidate_max_entries,
+    max_bytes=settings.http_revalidate_max_bytes,
+    sweep_interval_seconds=settings.cache_sweep_interval_seconds,
+)
+
+_stats = {"full": 0, "not_modified": 0}
+
+
+async def fetch_json(client: httpx.AsyncClient, url: str, params: dict[str, Any] | None = None) -> Any:
+    """
+    GET a JSON document, revalidating with `If-None-Match` / `If-Modified-Since`
+    when validators from an earlier response are known. On 304 the previously
+    parsed object is returned as-is (no body download, no JSON parsing).
+
+    Raises `httpx.HTTPStatusError` for non-success responses, like `raise_for_status`.
+    """
+    key = str(httpx.URL(url, params=params))
+    prev: _Validated | None = _validators.get(key)
+
+    headers: dict[str, str] = {}
+    if prev is not None:
+        if prev.etag:
+            headers["If-None-Match"] = prev.etag
+        if prev.last_modified:
+            headers["If-Modified-Since"] = prev.last_modified
+
+    r = await client.get(url, params=params, headers=headers)
+    if r.status_code == 304 and prev is not None:
+        _stats["not_modified"] += 1
+        _validators.set(key, prev, ttl_seconds=settings.http_revalidate_retention_seconds)
+        return prev.data
+
+    r.raise_for_status()
+    data = r.json()
+    _stats["full"] += 1
+
+    etag = r.headers.get("etag")
+    last_modified = r.headers.get("last-modified")
+    if etag or last_modified:
+        _validators.set(
+            key,
+            _Validated(data=data, etag=etag, last_modified=last_modified),
+            ttl_seconds=settings.http_revalidate_retention_seconds,
+        )
+    return data
+
+
+def revalidation_stats() -> dict[str, Any]:
+    return {**_stats, "validators": len(_validators)}
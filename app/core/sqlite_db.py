@@ -0,0 +1,62 @@
+import os
+import sqlite3
+import threading
+from typing import Any, Sequence
+
+
+class SQLiteDB:
+    """
+    A SQLite file shared by every uvicorn worker on the host, in WAL mode so
+    readers never block the writer. sqlite3 connections can't be shared
+    between threads, so each thread gets its own; `schema` statements run on
+    the first connection.
+
+    Every store built on this is an optimisation or a convenience view, so
+    the query helpers swallow `sqlite3.Error` and return a default instead:
+    a broken or locked database must never fail a request.
+    """
+
+    def __init__(self, path: str, schema: Sequence[str] = (), row_factory: Any = None) -> None:
+        self.path = path
+        self.schema = tuple(schema)
+        self.row_factory = row_factory
+        self._local = threading.local()
+        self._ready = False
+
+    def conn(self) -> sqlite3.Connection:
+        """This thread's connection; raises `sqlite3.Error`/`OSError` (callers mixing in file I/O catch both)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            if self.row_factory is not None:
+                conn.row_factory = self.row_factory
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            if not self._ready:
+                for statement in self.schema:
+                    conn.execute(statement)
+                self._ready = True
+            self._local.conn = conn
+        return conn
+
+    def execute(self, sql: str, params: Sequence[Any] = ()) -> sqlite3.Cursor | None:
+        try:
+            return self.conn().execute(sql, params)
+        except (sqlite3.Error, OSError):
+            return None
+
+    def fetchone(self, sql: str, params: Sequence[Any] = ()) -> Any:
+        cur = self.execute(sql, params)
+        try:
+            return cur.fetchone() if cur is not None else None
+        except sqlite3.Error:
+            return None
+
+    def fetchall(self, sql: str, params: Sequence[Any] = ()) -> list[Any] | None:
+        """All rows, or None when the query failed (so callers can tell "no rows" from "unreadable")."""
+        cur = self.execute(sql, params)
+        try:
+            return cur.fetchall() if cur is not None else None
+        except sqlite3.Error:
+            return None
@@ -0,0 +1,37 @@
+import io
+import zipfile
+from typing import AsyncIterator
+
+
+class _Sink(io.RawIOBase):
+    # tidak seekable -> zipfile pakai data descriptor, jadi tiap entry bisa langsung dikirim
+    def __init__(self) -> None:
+        self._chunks: list[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:  # type: ignore[override]
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self) -> bytes:
+        out = b"".join(self._chunks)
+        self._chunks.clear()
+        return out
+
+
+async def zip_stream(entries: AsyncIterator[tuple[str, bytes]], compress: bool = False) -> AsyncIterator[bytes]:
+    """
+    Stream a ZIP archive entry by entry as `(name, data)` pairs arrive,
+    without buffering the whole archive. Entries are stored as-is unless
+    `compress` is set (PNG/JPEG/... gain nothing from deflate).
+    """
+    sink = _Sink()
+    method = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+    with zipfile.ZipFile(sink, "w", compression=method) as zf:
+        async for name, data in entries:
+            zf.writestr(name, data)
+            yield sink.drain()
+    # central directory ditulis saat close
+    yield sink.drain()
@@ -2,26 +2,46 @@ from fastapi import APIRouter, Depends, HTTPException
 import httpx
 
 from app.core.cache import TTLCache
+from app.core.cache_backends import make_backend
 from app.core.config import settings
 from app.core.deps import get_http_client
+from app.core.responses import envelope, json_bytes_response, make_encoder
 from app.core.security import require_api_key
 from app.services.bmkg_service import fetch_bmkg_autogempa
 
 router = APIRouter(prefix="/api/bmkg", tags=["BMKG"], dependencies=[Depends(require_api_key)])
 
-_cache = TTLCache()
+_cache = TTLCache(
+    max_entries=settings.bmkg_cache_max_entries,
+    max_bytes=settings.bmkg_cache_max_bytes,
+    sweep_interval_seconds=settings.cache_sweep_interval_seconds,
+    backend=make_backend("bmkg"),
+    stale_grace_seconds=settings.bmkg_cache_stale_grace_seconds,
+    refresh_ahead_seconds=settings.bmkg_cache_refresh_ahead_seconds,
+    # cuma `data` yang dipakai; envelope-nya beda per request (cached/stale/age)
+    encoder=make_encoder(),
+)
 
 
 @router.get("/autogempa")
 async def autogempa(client: httpx.AsyncClient = Depends(get_http_client)):
-    cached = _cache.get("autogempa")
-    if cached:
-        return {"ok": True, "cached": True, "data": cached}
-
     try:
-        data = await fetch_bmkg_autogempa(client)
+        res = await _cache.aget_or_compute(
+            "autogempa",
+            lambda: fetch_bmkg_autogempa(client),
+            ttl_seconds=settings.bmkg_cache_ttl_seconds,
+        )
     except httpx.HTTPError as e:
         raise HTTPException(status_code=502, detail={"ok": False, "error": str(e)})
 
-    _cache.set("autogempa", data, ttl_seconds=settings.bmkg_cache_ttl_seconds)
-    return {"ok": True, "cached": False, "data": data, "source": "BMKG"}
\ No newline at end of file
+    # data sudah di-encode saat disimpan; cuma envelope kecil yang di-encode per request
+    return json_bytes_response(
+        envelope(
+            res.encoded.data,
+            ok=True,
+            cached=res.cached,
+            stale=res.stale,
+            age_seconds=round(res.age, 1),
+            source="BMKG",
+        )
+    )
\ No newline at end of file
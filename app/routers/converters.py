@@ -1,7 +1,12 @@
-import os
-from fastapi import APIRouter, UploadFile, File, BackgroundTasks
-from fastapi.responses import FileResponse
-from app.services.converters import converter_service
+import asyncio
+from typing import Any, BinaryIO, Literal, Optional, get_args
+
+from fastapi import APIRouter, UploadFile, File, Form, BackgroundTasks, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from app.core.responses import open_file_response
+from app.core.result_cache import result_cache
+from app.services.convert_jobs import ConvertJob, convert_jobs
+from app.services.converters import format_page_ranges, parse_page_ranges
 
 router = APIRouter(
     prefix="/api/convert",
@@ -9,57 +14,204 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
-def remove_file(path: str):
-    converter_service.cleanup(path)
+ConverterType = Literal["pdf-to-word", "audio-extract", "video-to-gif"]
+AudioFormat = Literal["auto", "mp3", "m4a", "opus"]
+AnimationFormat = Literal["gif", "webp", "mp4"]
+_BITRATE = r"^\d{2,3}k$"
 
-@router.post("/pdf-to-word")
-async def pdf_to_word(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
-    """Convert PDF to DOCX."""
-    input_path = converter_service._save_upload_file(file)
+def _job_error(job: ConvertJob) -> HTTPException:
+    return HTTPException(status_code=job.status_code or 500, detail={"ok": False, "error": job.error})
+
+def _open_output(job: ConvertJob) -> BinaryIO | None:
+    # dibuka sekarang: kalau result cache meng-evict file setelah ini, handle tetap bisa dibaca
     try:
-        output_path = converter_service.convert_pdf_to_word(input_path)
-        # Schedule cleanup
-        background_tasks.add_task(remove_file, input_path)
-        background_tasks.add_task(remove_file, output_path)
-        return FileResponse(
-            output_path, 
-            media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document", 
-            filename=f"{file.filename}.docx"
-        )
-    except Exception:
-        remove_file(input_path)
-        raise
+        return open(job.output_path, "rb")
+    except (OSError, TypeError):
+        return None
+
+def _result_response(job: ConvertJob, fh: BinaryIO) -> StreamingResponse:
+    headers = {"X-Result-Cache": "hit" if job.from_cache else "miss"}
+    if job.kind == "audio-extract":
+        # copy = remux tanpa re-encode, encode = transcode, cached = dari result cache
+        headers["X-Audio-Path"] = job.info.get("mode", "cached")
+        if job.info:
+            headers["X-Audio-Source-Codec"] = job.info["source_codec"]
+    elif job.kind == "pdf-to-word" and job.info:
+        # rincian per halaman ada di GET /api/convert/jobs/{id}
+        headers["X-Pdf-Pages"] = str(job.info["pages"])
+        headers["X-Pdf-Workers"] = str(job.info["workers"])
+        headers["X-Pdf-Parse-Ms"] = str(job.info["parse_ms"])
+    elif job.kind == "video-to-gif" and job.info:
+        headers["X-Animation-Fps"] = str(job.info["fps"])
+        headers["X-Animation-Width"] = str(job.info["width"])
+        headers["X-Animation-Duration"] = f"{job.info['duration']:g}"
+    return open_file_response(
+        fh,
+        media_type=job.media_type or job.spec.media_type,
+        filename=f"{job.filename}.{job.ext or job.spec.ext}",
+        headers=headers,
+    )
+
+def _audio_params(format: str, bitrate: Optional[str]) -> dict[str, Any]:
+    params: dict[str, Any] = {"format": format}
+    if bitrate:
+        params["bitrate"] = bitrate
+    return params
+
+def _pdf_params(start: Optional[int], end: Optional[int], pages: Optional[str]) -> dict[str, Any]:
+    if pages:
+        try:
+            # dinormalisasi supaya "3,1,2" dan "1-3" memakai entri cache yang sama
+            indexes = parse_page_ranges(pages)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail={"ok": False, "error": str(e)})
+        return {"pages": format_page_ranges(indexes)}
+    if start and end and end < start:
+        raise HTTPException(status_code=400, detail={"ok": False, "error": "end must not be before start"})
+    return {name: value for name, value in (("start", start), ("end", end)) if value is not None}
+
+def _gif_params(
+    format: str, fps: Optional[int], width: Optional[int], start: float, duration: Optional[float]
+) -> dict[str, Any]:
+    # hanya opsi yang diisi, supaya cache key request tanpa opsi tetap sama
+    params: dict[str, Any] = {"format": format}
+    for name, value in (("fps", fps), ("width", width), ("duration", duration)):
+        if value is not None:
+            params[name] = value
+    if start:
+        params["start"] = start
+    return params
+
+async def _convert(
+    background_tasks: BackgroundTasks, file: UploadFile, kind: str, params: dict[str, Any] | None = None
+) -> StreamingResponse:
+    # endpoint lama: job biasa yang ditunggu sampai selesai, event loop tetap bebas
+    for _ in range(2):
+        job = await convert_jobs.submit(kind, file, params)
+        await convert_jobs.wait(job)
+        if job.status != "done":
+            convert_jobs.discard(job.id)
+            raise _job_error(job)
+        fh = await asyncio.to_thread(_open_output, job)
+        if fh is not None:
+            break
+        # output di result cache tergeser LRU worker lain sebelum sempat dibuka: anggap miss, hitung ulang
+        convert_jobs.discard(job.id)
+        await file.seek(0)
+    else:
+        raise HTTPException(status_code=503, detail={"ok": False, "error": "Result was evicted, try again"})
+    background_tasks.add_task(convert_jobs.discard, job.id)
+    return _result_response(job, fh)
+
+@router.post("/pdf-to-word")
+async def pdf_to_word(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    start: Optional[int] = Query(None, ge=1, description="First page (1-based)"),
+    end: Optional[int] = Query(None, ge=1, description="Last page (inclusive)"),
+    pages: Optional[str] = Query(None, description='e.g. "1-3,7"; overrides start/end'),
+):
+    """
+    Convert PDF to DOCX. Big page selections are parsed by several processes
+    (`PDF_WORKERS`); at most `PDF_MAX_PAGES` pages per request.
+    """
+    return await _convert(background_tasks, file, "pdf-to-word", _pdf_params(start, end, pages))
 
 @router.post("/audio-extract")
-async def audio_extract(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
-    """Extract Audio (MP3) from Video."""
-    input_path = converter_service._save_upload_file(file)
-    try:
-        output_path = converter_service.extract_audio(input_path)
-        background_tasks.add_task(remove_file, input_path)
-        background_tasks.add_task(remove_file, output_path)
-        return FileResponse(
-            output_path,
-            media_type="audio/mpeg",
-            filename=f"{file.filename}.mp3"
-        )
-    except Exception:
-        remove_file(input_path)
-        raise
+async def audio_extract(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    format: AudioFormat = Query("auto", description="auto = copy the source codec when possible, else MP3"),
+    bitrate: Optional[str] = Query(None, pattern=_BITRATE, description="e.g. 128k; forces re-encoding"),
+):
+    """
+    Extract Audio from Video. The audio stream is copied without re-encoding
+    when the codec fits the chosen container (`X-Audio-Path: copy`),
+    otherwise it is encoded (`X-Audio-Path: encode`).
+    """
+    return await _convert(background_tasks, file, "audio-extract", _audio_params(format, bitrate))
 
 @router.post("/video-to-gif")
-async def video_to_gif(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
-    """Convert Video to GIF."""
-    input_path = converter_service._save_upload_file(file)
-    try:
-        output_path = converter_service.video_to_gif(input_path)
-        background_tasks.add_task(remove_file, input_path)
-        background_tasks.add_task(remove_file, output_path)
-        return FileResponse(
-            output_path,
-            media_type="image/gif",
-            filename=f"{file.filename}.gif"
+async def video_to_gif(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    format: AnimationFormat = Query("gif", description="webp/mp4 are much smaller than GIF"),
+    fps: Optional[int] = Query(None, ge=1, description="Capped by GIF_MAX_FPS"),
+    width: Optional[int] = Query(None, ge=16, description="Capped by GIF_MAX_WIDTH, never upscaled"),
+    start: float = Query(0.0, ge=0, description="Start offset in seconds"),
+    duration: Optional[float] = Query(None, gt=0, description="Seconds, capped by GIF_MAX_DURATION_SECONDS"),
+):
+    """
+    Convert Video to GIF (or animated WebP / silent MP4). The effective
+    fps/width/duration after the server caps are in the `X-Animation-*` headers.
+    """
+    return await _convert(background_tasks, file, "video-to-gif", _gif_params(format, fps, width, start, duration))
+
+@router.post("/jobs", status_code=202)
+async def create_job(
+    type: ConverterType = Form(...),
+    file: UploadFile = File(...),
+    format: Optional[str] = Form(None, description="audio-extract: auto|mp3|m4a|opus, video-to-gif: gif|webp|mp4"),
+    bitrate: Optional[str] = Form(None, pattern=_BITRATE, description="audio-extract only"),
+    fps: Optional[int] = Form(None, ge=1, description="video-to-gif only"),
+    width: Optional[int] = Form(None, ge=16, description="video-to-gif only"),
+    start: float = Form(0.0, ge=0, description="video-to-gif only"),
+    duration: Optional[float] = Form(None, gt=0, description="video-to-gif only"),
+    start_page: Optional[int] = Form(None, ge=1, description="pdf-to-word only"),
+    end_page: Optional[int] = Form(None, ge=1, description="pdf-to-word only"),
+    pages: Optional[str] = Form(None, description="pdf-to-word only"),
+):
+    """
+    Queue a conversion and return immediately with a job id.
+    Poll `GET /api/convert/jobs/{id}`, then download `GET /api/convert/jobs/{id}/result`.
+    """
+    params = None
+    if type == "pdf-to-word":
+        params = _pdf_params(start_page, end_page, pages)
+    elif type == "audio-extract":
+        format = format or "auto"
+        if format not in get_args(AudioFormat):
+            raise HTTPException(status_code=400, detail={"ok": False, "error": f"Unsupported audio format: {format}"})
+        params = _audio_params(format, bitrate)
+    elif type == "video-to-gif":
+        format = format or "gif"
+        if format not in get_args(AnimationFormat):
+            raise HTTPException(status_code=400, detail={"ok": False, "error": f"Unsupported animation format: {format}"})
+        params = _gif_params(format, fps, width, start, duration)
+    job = await convert_jobs.submit(type, file, params)
+    return {"ok": True, "job": job.to_dict()}
+
+@router.get("/jobs")
+def jobs_stats():
+    return {"ok": True, "jobs": convert_jobs.stats()}
+
+def _get_job(job_id: str) -> ConvertJob:
+    job = convert_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail={"ok": False, "error": "Job not found or expired"})
+    return job
+
+@router.get("/jobs/{job_id}")
+def job_status(job_id: str):
+    return {"ok": True, "job": _get_job(job_id).to_dict()}
+
+@router.get("/jobs/{job_id}/result")
+def job_result(job_id: str):
+    job = _get_job(job_id)
+    if job.status == "failed":
+        raise _job_error(job)
+    if job.status != "done":
+        raise HTTPException(
+            status_code=409,
+            detail={"ok": False, "error": f"Job is {job.status}", "job": job.to_dict()},
+            headers={"Retry-After": "2"},
         )
-    except Exception:
-        remove_file(input_path)
-        raise
+    fh = _open_output(job)
+    if fh is None:
+        # output sudah tergeser LRU result cache
+        raise HTTPException(status_code=410, detail={"ok": False, "error": "Result no longer available"})
+    return _result_response(job, fh)
+
+@router.get("/cache")
+def cache_stats():
+    return {"ok": True, "cache": result_cache.stats()}
@@ -1,42 +1,186 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from app.core.cache import TTLCache
+import asyncio
+import functools
+import time
+from typing import Any, List, Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from starlette.background import BackgroundTask
+
+from app.core.cache import CacheResult, TTLCache
+from app.core.cache_backends import make_backend
 from app.core.config import settings
+from app.core.responses import dumps, encoded_response, envelope, json_bytes_response, make_encoder
 from app.core.security import require_api_key
-from app.services.ytdlp_service import extract_media_info, build_direct_links
+from app.services.ytdlp_service import (
+    SLIM_FIELDS,
+    SLIM_FORMAT_FIELDS,
+    canonical_key,
+    extract_direct_links,
+    extract_media_info,
+    pick_format,
+    ytdlp_pool,
+)
+from app.services.media_proxy import media_proxy
 
 router = APIRouter(prefix="/api/dl", tags=["Downloader"], dependencies=[Depends(require_api_key)])
 
-_cache = TTLCache()
+_cache = TTLCache(
+    max_entries=settings.ytdlp_cache_max_entries,
+    max_bytes=settings.ytdlp_cache_max_bytes,
+    sweep_interval_seconds=settings.cache_sweep_interval_seconds,
+    backend=make_backend("ytdlp"),
+    encoder=make_encoder(ok=True, cached=True),
+)
 
 
-@router.get("/info")
-def info(url: str = Query(..., description="URL TikTok/IG/YouTube/X/dll")):
-    cache_key = f"info:{url}"
-    cached = _cache.get(cache_key)
-    if cached:
-        return {"ok": True, "cached": True, "data": cached}
+class BatchRequest(BaseModel):
+    urls: List[str]
+    mode: Literal["direct", "info"] = "direct"
+    slim: bool = False
+
+
+def _direct_ttl(data: dict[str, Any]) -> float:
+    """Keep direct links until shortly before the earliest signed URL expires (capped)."""
+    expires_at = data.get("expires_at")
+    if not expires_at:
+        return settings.ytdlp_cache_ttl_seconds
+    ttl = expires_at - time.time() - settings.ytdlp_direct_expiry_margin_seconds
+    return max(0.0, min(ttl, settings.ytdlp_direct_ttl_max_seconds))
+
+
+def _projection(
+    fields: str | None, format_fields: str | None, slim: bool
+) -> tuple[tuple[str, ...] | None, tuple[str, ...] | None]:
+    def parse(raw: str | None, preset: tuple[str, ...]) -> tuple[str, ...] | None:
+        if raw:
+            return tuple(sorted({x.strip() for x in raw.split(",") if x.strip()})) or None
+        return preset if slim else None
+
+    return parse(fields, SLIM_FIELDS), parse(format_fields, SLIM_FORMAT_FIELDS)
 
+
+async def _resolve(
+    mode: str,
+    url: str,
+    fields: tuple[str, ...] | None = None,
+    format_fields: tuple[str, ...] | None = None,
+) -> CacheResult:
+    ttl = _direct_ttl if mode == "direct" else settings.ytdlp_cache_ttl_seconds
     try:
-        data = extract_media_info(url)
+        # scan pola URL extractor bisa beberapa ms untuk URL baru, jangan di event loop
+        key = f"{mode}:{await asyncio.to_thread(canonical_key, url)}"
+        if mode == "direct":
+            job = functools.partial(ytdlp_pool.run, extract_direct_links, url)
+        else:
+            # proyeksi beda = entry cache beda
+            key += f":{','.join(fields or ())}|{','.join(format_fields or ())}"
+            job = functools.partial(ytdlp_pool.run, extract_media_info, url, fields, format_fields)
+        return await _cache.aget_or_compute(key, job, ttl_seconds=ttl)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail={"ok": False, "error": str(e)})
 
-    _cache.set(cache_key, data, ttl_seconds=settings.ytdlp_cache_ttl_seconds)
-    return {"ok": True, "cached": False, "data": data}
+
+@router.get("/info")
+async def info(
+    request: Request,
+    url: str = Query(..., description="URL TikTok/IG/YouTube/X/dll"),
+    fields: Optional[str] = Query(None, description="Top-level keys to keep, comma separated (e.g. title,duration,formats)"),
+    format_fields: Optional[str] = Query(None, description="Keys to keep per format, comma separated (e.g. format_id,url,ext)"),
+    slim: bool = Query(False, description="Compact preset for fields/format_fields that are not given"),
+):
+    fields_t, format_fields_t = _projection(fields, format_fields, slim)
+    return _respond(request, await _resolve("info", url, fields_t, format_fields_t))
 
 
 @router.get("/direct")
-def direct(url: str = Query(..., description="URL TikTok/IG/YouTube/X/dll")):
-    cache_key = f"direct:{url}"
-    cached = _cache.get(cache_key)
-    if cached:
-        return {"ok": True, "cached": True, "data": cached}
+async def direct(request: Request, url: str = Query(..., description="URL TikTok/IG/YouTube/X/dll")):
+    return _respond(request, await _resolve("direct", url))
+
+
+# cukup data format untuk proxy; entry cache-nya terpisah dari /info biasa
+_STREAM_FORMAT_FIELDS = tuple(sorted(
+    ("format_id", "url", "ext", "protocol", "vcodec", "acodec", "height", "abr", "tbr", "filesize", "http_headers")
+))
+
+
+@router.get("/stream")
+async def stream(
+    request: Request,
+    url: str = Query(..., description="URL TikTok/IG/YouTube/X/dll"),
+    kind: Literal["progressive", "video", "audio"] = Query("progressive"),
+    format_id: Optional[str] = Query(None, description="Exact yt-dlp format_id, overrides kind"),
+):
+    """
+    Relay the media bytes through this server (for IP-bound/header-protected links).
+    `Range` is forwarded, so seeking and resumed downloads work.
+    """
+    res = await _resolve("info", url, ("formats", "title"), _STREAM_FORMAT_FIELDS)
+    fmt = pick_format(res.value.get("formats") or [], kind, format_id)
+    if fmt is None:
+        raise HTTPException(status_code=404, detail={"ok": False, "error": "No matching format"})
+
+    status_code, headers, body, close = await media_proxy.open(fmt, request.headers.get("range"))
+    # kalau client putus sebelum chunk pertama, generator body tidak pernah jalan;
+    # background task tetap jalan, jadi slot dan koneksi upstream pasti dilepas
+    return StreamingResponse(body, status_code=status_code, headers=headers, background=BackgroundTask(close))
+
+
+@router.get("/stream/stats")
+def stream_stats():
+    return {"ok": True, "streams": media_proxy.stats()}
+
+
+@router.post("/batch")
+async def batch(body: BatchRequest):
+    """
+    Resolve many URLs concurrently. Results are streamed as NDJSON in completion
+    order (one line per URL, with its `index` in the request), so fast extractors
+    don't wait for the slowest one.
+    """
+    urls = [u.strip() for u in body.urls if u and u.strip()]
+    if not urls:
+        raise HTTPException(status_code=400, detail={"ok": False, "error": "urls is empty"})
+    if len(urls) > settings.ytdlp_batch_max_urls:
+        raise HTTPException(
+            status_code=400,
+            detail={"ok": False, "error": f"max {settings.ytdlp_batch_max_urls} urls per batch"},
+        )
+
+    projection = _projection(None, None, body.slim)
+    sem = asyncio.Semaphore(settings.ytdlp_batch_concurrency)
+
+    async def one(index: int, url: str) -> bytes:
+        async with sem:
+            try:
+                res = await _resolve(body.mode, url, *projection)
+            except HTTPException as e:
+                error = e.detail.get("error") if isinstance(e.detail, dict) else str(e.detail)
+                return dumps({"index": index, "url": url, "ok": False, "status": e.status_code, "error": error})
+        return envelope(res.encoded.data, index=index, url=url, ok=True, cached=res.cached)
+
+    async def stream():
+        tasks = [asyncio.ensure_future(one(i, u)) for i, u in enumerate(urls)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done + b"\n"
+        finally:
+            # client putus: jangan lanjutkan ekstraksi yang belum mulai
+            for t in tasks:
+                t.cancel()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+def _respond(request: Request, res):
+    if res.cached:
+        return encoded_response(request, res.encoded)
+    return json_bytes_response(envelope(res.encoded.data, ok=True, cached=False))
 
-    try:
-        info_obj = extract_media_info(url)
-        data = build_direct_links(info_obj)
-    except Exception as e:
-        raise HTTPException(status_code=400, detail={"ok": False, "error": str(e)})
 
-    _cache.set(cache_key, data, ttl_seconds=settings.ytdlp_cache_ttl_seconds)
-    return {"ok": True, "cached": False, "data": data}
\ No newline at end of file
+@router.get("/pool")
+def pool_stats():
+    return {"ok": True, "pool": ytdlp_pool.stats(), "cache": _cache.stats()}
@@ -1,47 +1,247 @@
-from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
-from fastapi.responses import Response
-import httpx
+import asyncio
+import base64
+import hashlib
+import os
+import re
+from typing import Any, BinaryIO, List, Literal, Optional
+from urllib.parse import urlsplit
 
-from app.core.deps import get_http_client
+from fastapi import APIRouter, Depends, File, Form, HTTPException, Query, UploadFile
+from fastapi.responses import Response, StreamingResponse
+from app.core.config import settings
+from app.core.remote_fetch import remote_fetcher
+from app.core.responses import dumps, open_file_response
+from app.core.result_cache import ResultEntry, result_cache
 from app.core.security import require_api_key
-from app.services.image_service import remove_bg_image_bytes, REMBG_AVAILABLE
+from app.core.zipstream import zip_stream
+from app.services.image_service import (
+    REMBG_AVAILABLE,
+    RemoveBgOptions,
+    image_pool,
+    rembg_pool,
+    remove_bg_batch,
+    remove_bg_image_bytes,
+)
 
 router = APIRouter(prefix="/api/img", tags=["Images"], dependencies=[Depends(require_api_key)])
 
 
-@router.post("/remove-bg")
-async def remove_bg(file: UploadFile = File(...)):
+def _require_rembg() -> None:
     if not REMBG_AVAILABLE:
         raise HTTPException(
             status_code=503,
             detail={"ok": False, "error": "rembg not available. Install rembg + onnxruntime."},
         )
 
-    raw = await file.read()
+
+def remove_bg_options(
+    max_side: Optional[int] = Query(None, ge=32, le=8192, description="Downscale so the longest side is at most this"),
+    format: Literal["png", "webp"] = Query("png"),
+    quality: int = Query(90, ge=1, le=100, description="WebP quality"),
+    compress_level: int = Query(6, ge=0, le=9, description="PNG zlib level (0 = fastest, 9 = smallest)"),
+    full_size: bool = Query(False, description="With max_side: run the model small, cut out at original size"),
+) -> RemoveBgOptions:
+    return RemoveBgOptions(
+        max_side=max_side, format=format, quality=quality, compress_level=compress_level, full_size=full_size
+    )
+
+
+def _result_key(raw: bytes, options: RemoveBgOptions, digest: str | None = None) -> str:
+    # model / opsi output beda = hasil beda
+    return result_cache.key(
+        "remove-bg", digest or hashlib.sha256(raw).hexdigest(), model=rembg_pool.model_name, **options.cache_params()
+    )
+
+
+def _lookup(
+    raw: bytes, options: RemoveBgOptions, digest: str | None = None
+) -> tuple[str, tuple[ResultEntry, BinaryIO] | None]:
+    key = _result_key(raw, options, digest)
+    # file langsung dibuka: kalau worker lain meng-evict sebelum response dikirim, handle tetap valid
+    return key, result_cache.open_entry(key)
+
+
+async def _remove_bg(raw: bytes, options: RemoveBgOptions, digest: str | None = None) -> Response:
+    # hash + index lookup di thread; gambar besar bisa puluhan MB
+    key, hit = await asyncio.to_thread(_lookup, raw, options, digest)
+    if hit is not None:
+        _, fh = hit
+        return open_file_response(fh, options.media_type, headers={"X-Result-Cache": "hit"})
+
     try:
-        out = remove_bg_image_bytes(raw)
+        out, queue_wait, inference = await image_pool.run_timed(remove_bg_image_bytes, raw, options)
+    except HTTPException:
+        # 503 antrian penuh / 504 timeout dari pool
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail={"ok": False, "error": str(e)})
+    await asyncio.to_thread(result_cache.put_bytes, key, out, options.media_type)
+
+    return Response(
+        content=out,
+        media_type=options.media_type,
+        headers={
+            "X-Queue-Wait-Ms": f"{queue_wait * 1000:.1f}",
+            "X-Inference-Ms": f"{inference * 1000:.1f}",
+            "X-Result-Cache": "miss",
+        },
+    )
 
-    return Response(content=out, media_type="image/png")
+
+@router.post("/remove-bg")
+async def remove_bg(file: UploadFile = File(...), options: RemoveBgOptions = Depends(remove_bg_options)):
+    _require_rembg()
+    raw = await file.read()
+    return await _remove_bg(raw, options)
 
 
 @router.get("/remove-bg-by-url")
 async def remove_bg_by_url(
     image_url: str,
-    client: httpx.AsyncClient = Depends(get_http_client),
+    options: RemoveBgOptions = Depends(remove_bg_options),
 ):
-    if not REMBG_AVAILABLE:
+    _require_rembg()
+    # stream dengan batas ukuran; 413/415 sebelum body habis diunduh
+    remote = await remote_fetcher.fetch(image_url)
+    return await _remove_bg(remote.content, options, remote.sha256)
+
+
+def _stem(name: str) -> str:
+    stem = os.path.splitext(os.path.basename(name))[0]
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", stem)[:80] or "image"
+
+
+@router.post("/remove-bg/batch")
+async def remove_bg_batch_endpoint(
+    files: Optional[List[UploadFile]] = File(None),
+    urls: Optional[List[str]] = Form(None),
+    output: Literal["zip", "ndjson"] = Form("zip"),
+    options: RemoveBgOptions = Depends(remove_bg_options),
+):
+    """
+    Remove backgrounds from many images (uploads and/or URLs) at once. Images
+    are preprocessed and run through the model in groups of `IMAGE_BATCH_SIZE`.
+
+    - **zip**: `NNN_<name>.<format>` per image plus `manifest.json` (errors + timings).
+    - **ndjson**: one line per image with `image_base64`, in request order.
+    """
+    _require_rembg()
+    files = files or []
+    urls = [u.strip() for u in urls or [] if u and u.strip()]
+    total = len(files) + len(urls)
+    if not total:
+        raise HTTPException(status_code=400, detail={"ok": False, "error": "Provide 'files' and/or 'urls'"})
+    if total > settings.image_batch_max_images:
         raise HTTPException(
-            status_code=503,
-            detail={"ok": False, "error": "rembg not available. Install rembg + onnxruntime."},
+            status_code=400,
+            detail={"ok": False, "error": f"max {settings.image_batch_max_images} images per batch"},
         )
 
+    # (nama, bytes, error) sesuai urutan request: file dulu, lalu url
+    items: list[tuple[str, bytes | None, str | None]] = [
+        (_stem(f.filename or "image"), await f.read(), None) for f in files
+    ]
+    sem = asyncio.Semaphore(settings.image_batch_fetch_concurrency)
+
+    async def fetch(url: str) -> tuple[str, bytes | None, str | None]:
+        name = _stem(urlsplit(url).path)
+        async with sem:
+            try:
+                remote = await remote_fetcher.fetch(url)
+            except HTTPException as e:
+                return name, None, e.detail.get("error") if isinstance(e.detail, dict) else str(e.detail)
+        return name, remote.content, None
+
+    items += await asyncio.gather(*(fetch(u) for u in urls))
+
+    async def run_group(start: int) -> list[dict[str, Any]]:
+        group = items[start : start + settings.image_batch_size]
+        lines = [
+            {"index": start + i, "name": name, "ok": False, "error": error}
+            for i, (name, _, error) in enumerate(group)
+        ]
+        todo: list[tuple[int, str]] = []
+        for i, (_, data, _) in enumerate(group):
+            if data is None:
+                continue
+            key = await asyncio.to_thread(_result_key, data, options)
+            image = await asyncio.to_thread(result_cache.read, key)
+            if image is not None:
+                lines[i].update(ok=True, error=None, image=image, cached=True)
+            else:
+                todo.append((i, key))
+        if not todo:
+            return lines
+        (outs, batched), queue_wait, inference = await image_pool.run_timed(
+            remove_bg_batch, [group[i][1] for i, _ in todo], options
+        )
+        timing = {
+            "batched": batched,
+            "queue_wait_ms": round(queue_wait * 1000, 1),
+            "inference_ms": round(inference * 1000, 1),
+        }
+        for (i, key), (image, error) in zip(todo, outs):
+            lines[i].update(ok=image is not None, error=error, image=image, cached=False, **timing)
+            if image is not None:
+                await asyncio.to_thread(result_cache.put_bytes, key, image, options.media_type)
+        return lines
+
+    # grup pertama dijalankan sebelum response mulai, supaya 503/504 dari pool masih bisa jadi status HTTP
     try:
-        r = await client.get(image_url)
-        r.raise_for_status()
-        out = remove_bg_image_bytes(r.content)
+        first = await run_group(0)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail={"ok": False, "error": str(e)})
 
-    return Response(content=out, media_type="image/png")
\ No newline at end of file
+    async def results():
+        yield first
+        for start in range(settings.image_batch_size, len(items), settings.image_batch_size):
+            try:
+                yield await run_group(start)
+            except Exception as e:
+                error = e.detail.get("error") if isinstance(e, HTTPException) and isinstance(e.detail, dict) else str(e)
+                group = items[start : start + settings.image_batch_size]
+                yield [
+                    {"index": start + i, "name": name, "ok": False, "error": error}
+                    for i, (name, _, _) in enumerate(group)
+                ]
+
+    if output == "ndjson":
+        async def ndjson():
+            async for lines in results():
+                for line in lines:
+                    image = line.pop("image", None)
+                    if image is not None:
+                        line["media_type"] = options.media_type
+                        line["image_base64"] = base64.b64encode(image).decode("ascii")
+                    yield dumps(line) + b"\n"
+
+        return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+    async def entries():
+        manifest = []
+        async for lines in results():
+            for line in lines:
+                image = line.pop("image", None)
+                if image is not None:
+                    line["file"] = f"{line['index']:03d}_{line['name']}.{options.format}"
+                    yield line["file"], image
+                manifest.append(line)
+        yield "manifest.json", dumps({"ok": True, "images": manifest})
+
+    return StreamingResponse(
+        zip_stream(entries()),
+        media_type="application/zip",
+        headers={"Content-Disposition": 'attachment; filename="remove-bg.zip"'},
+    )
+
+
+@router.get("/pool")
+def pool_stats():
+    return {
+        "ok": True,
+        "pool": image_pool.stats(),
+        "result_cache": result_cache.stats(),
+        "fetch": remote_fetcher.stats(),
+    }
@@ -1,5 +1,9 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Request
 from typing import Optional
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.responses import encoded_response, make_encoder
 from app.services.islamic import islamic_service
 
 router = APIRouter(
@@ -8,28 +12,41 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
+# data Quran/Hadith praktis statis, simpan body JSON yang sudah di-encode
+_cache = TTLCache(
+    max_entries=settings.islamic_cache_max_entries,
+    max_bytes=settings.islamic_cache_max_bytes,
+    sweep_interval_seconds=settings.cache_sweep_interval_seconds,
+    encoder=make_encoder(),
+)
+
+
+async def _cached(request: Request, key: str, fn):
+    res = await _cache.aget_or_compute(key, fn, ttl_seconds=settings.islamic_cache_ttl_seconds)
+    return encoded_response(request, res.encoded)
+
 @router.get("/quran")
-async def get_surahs():
+async def get_surahs(request: Request):
     """Get list of all Surahs."""
-    return await islamic_service.get_all_surahs()
+    return await _cached(request, "quran", islamic_service.get_all_surahs)
 
 @router.get("/quran/{nomor}")
-async def get_surah_detail(nomor: int):
+async def get_surah_detail(request: Request, nomor: int):
     """Get specific Surah details."""
-    return await islamic_service.get_surah_detail(nomor)
+    return await _cached(request, f"quran:{nomor}", lambda: islamic_service.get_surah_detail(nomor))
 
 @router.get("/hadith")
-async def get_hadith_books():
+async def get_hadith_books(request: Request):
     """Get available Hadith books/editions."""
-    return await islamic_service.get_hadith_books()
+    return await _cached(request, "hadith", islamic_service.get_hadith_books)
 
 @router.get("/hadith/{book}")
-async def get_hadith_by_book(book: str):
+async def get_hadith_by_book(request: Request, book: str):
     """
     Get Hadiths from a specific book.
     Example book: 'eng-bukhari'
     """
-    return await islamic_service.get_hadith_by_book(book)
+    return await _cached(request, f"hadith:{book}", lambda: islamic_service.get_hadith_by_book(book))
 
 @router.get("/imsak")
 async def get_imsak(lat: float, long: float, date: Optional[str] = Query(None, description="dd-mm-yyyy")):
@@ -1,6 +1,10 @@
 from fastapi import APIRouter
 from fastapi.responses import RedirectResponse
 
+from app.core.http_clients import http_clients
+from app.core.revalidate import revalidation_stats
+from app.services.image_service import rembg_pool
+
 router = APIRouter(tags=["Meta"])
 
 
@@ -11,4 +15,9 @@ def root():
 
 @router.get("/health")
 def health():
-    return {"ok": True, "status": "up"}
\ No newline at end of file
+    return {"ok": True, "status": "up", "rembg": rembg_pool.stats()}
+
+
+@router.get("/health/http")
+def health_http():
+    return {"ok": True, "pools": http_clients.stats(), "revalidation": revalidation_stats()}
\ No newline at end of file
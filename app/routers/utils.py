@@ -1,12 +1,20 @@
+import asyncio
 import base64
 import hashlib
-import io
+import re
+import time
+from typing import List, Literal, Optional
 
-import qrcode
-from fastapi import APIRouter, Depends, Query
-from fastapi.responses import Response
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, Field
 
+from app.core.config import settings
+from app.core.responses import dumps
 from app.core.security import require_api_key
+from app.core.zipstream import zip_stream
+from app.services.hash_service import ALGORITHMS, hash_stream, parse_algorithms
+from app.services.qr_service import MEDIA_TYPES, qr_cache_stats, render_qr
 
 router = APIRouter(prefix="/api/utils", tags=["Utils"], dependencies=[Depends(require_api_key)])
 
@@ -18,6 +26,33 @@ def hash_text(text: str, algo: str = Query("sha256", enum=["md5", "sha1", "sha25
     return {"ok": True, "algo": algo, "digest": h.hexdigest()}
 
 
+@router.post("/hash")
+async def hash_file(
+    file: UploadFile = File(...),
+    algos: str = Query("sha256", description=f"Comma separated, any of: {', '.join(ALGORITHMS)}"),
+):
+    """Checksum an uploaded file with one or more algorithms in a single streaming pass."""
+    try:
+        algo_list = parse_algorithms(algos)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail={"ok": False, "error": str(e)})
+
+    started = time.perf_counter()
+    # upload sudah di-spool Starlette (disk kalau besar); baca langsung dari file-nya
+    args = (file.file, algo_list, settings.hash_chunk_bytes)
+    if (file.size or 0) >= settings.hash_thread_min_bytes:
+        digests, size = await asyncio.to_thread(hash_stream, *args)
+    else:
+        digests, size = hash_stream(*args)
+    return {
+        "ok": True,
+        "filename": file.filename,
+        "size": size,
+        "digests": digests,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
 @router.get("/base64/encode")
 def b64_encode(text: str):
     return {"ok": True, "base64": base64.b64encode(text.encode("utf-8")).decode("ascii")}
@@ -29,9 +64,85 @@ def b64_decode(b64: str):
     return {"ok": True, "text": raw.decode("utf-8", errors="replace")}
 
 
+QrFormat = Literal["png", "svg"]
+QrErrorCorrection = Literal["L", "M", "Q", "H"]
+
+
+def _render(text: str, format: str, box_size: int, border: int, error_correction: str) -> bytes:
+    try:
+        return render_qr(text, format, box_size, border, error_correction)
+    except Exception as e:
+        # DataOverflowError dll: teks terlalu panjang untuk QR
+        raise HTTPException(status_code=400, detail={"ok": False, "error": f"Cannot encode QR: {e}"})
+
+
 @router.get("/qr")
-def qr(text: str):
-    img = qrcode.make(text)
-    buf = io.BytesIO()
-    img.save(buf, format="PNG")
-    return Response(content=buf.getvalue(), media_type="image/png")
\ No newline at end of file
+def qr(
+    text: str,
+    format: QrFormat = Query("png"),
+    box_size: int = Query(10, ge=1, le=50, description="Pixels per module"),
+    border: int = Query(4, ge=0, le=20, description="Quiet zone in modules"),
+    error_correction: QrErrorCorrection = Query("M"),
+):
+    content = _render(text, format, box_size, border, error_correction)
+    return Response(content=content, media_type=MEDIA_TYPES[format])
+
+
+class QrBatchItem(BaseModel):
+    text: str
+    name: Optional[str] = None
+
+
+class QrBatchRequest(BaseModel):
+    items: List[QrBatchItem]
+    format: QrFormat = "png"
+    box_size: int = Field(10, ge=1, le=50)
+    border: int = Field(4, ge=0, le=20)
+    error_correction: QrErrorCorrection = "M"
+
+
+@router.post("/qr/batch")
+async def qr_batch(body: QrBatchRequest):
+    """
+    Generate many QR codes into a streamed ZIP (`NNNN_<name>.<format>` + `manifest.json`).
+    Codes are rendered in chunks in a worker thread while earlier ones are already sent.
+    """
+    if not body.items:
+        raise HTTPException(status_code=400, detail={"ok": False, "error": "items is empty"})
+    if len(body.items) > settings.qr_batch_max_items:
+        raise HTTPException(
+            status_code=400,
+            detail={"ok": False, "error": f"max {settings.qr_batch_max_items} items per batch"},
+        )
+
+    def render_chunk(start: int) -> list[tuple[str, bytes | None, str | None]]:
+        out = []
+        for i, item in enumerate(body.items[start : start + 32], start):
+            name = re.sub(r"[^A-Za-z0-9._-]+", "_", item.name or "qr")[:80] or "qr"
+            try:
+                content = render_qr(item.text, body.format, body.box_size, body.border, body.error_correction)
+                out.append((f"{i:04d}_{name}.{body.format}", content, None))
+            except Exception as e:
+                out.append((f"{i:04d}_{name}.{body.format}", None, str(e)))
+        return out
+
+    async def entries():
+        manifest = []
+        for start in range(0, len(body.items), 32):
+            for filename, content, error in await asyncio.to_thread(render_chunk, start):
+                manifest.append({"file": filename, "ok": error is None, "error": error})
+                if content is not None:
+                    yield filename, content
+        yield "manifest.json", dumps({"ok": True, "items": manifest})
+
+    return StreamingResponse(
+        # SVG teks -> deflate; PNG 1-bit sudah terkompres
+        zip_stream(entries(), compress=body.format == "svg"),
+        media_type="application/zip",
+        headers={"Content-Disposition": 'attachment; filename="qr.zip"'},
+    )
+
+
+@router.get("/qr/stats")
+def qr_stats():
+    return {"ok": True, "cache": qr_cache_stats()}
\ No newline at end of file
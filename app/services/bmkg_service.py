@@ -1,9 +1,10 @@
 import httpx
 
+from app.core.revalidate import fetch_json
+
 BMKG_AUTOGEMPA_JSON = "https://data.bmkg.go.id/DataMKG/TEWS/autogempa.json"
 
 
 async def fetch_bmkg_autogempa(client: httpx.AsyncClient) -> dict:
-    r = await client.get(BMKG_AUTOGEMPA_JSON)
-    r.raise_for_status()
-    return r.json()
\ No newline at end of file
+    # conditional GET: kalau belum ada gempa baru BMKG jawab 304 dan objek lama dipakai lagi
+    return await fetch_json(client, BMKG_AUTOGEMPA_JSON)
\ No newline at end of file
@@ -0,0 +1,421 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import sqlite3
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from fastapi import HTTPException, UploadFile
+
+from app.core.config import settings
+from app.core.executors import BoundedExecutor
+from app.core.result_cache import result_cache
+from app.core.sqlite_db import SQLiteDB
+from app.services.converters import converter_service
+
+
+@dataclass(frozen=True)
+class ConverterSpec:
+    kind: str
+    # (input_path, **params) -> output_path atau (output_path, info); jalan di worker process
+    fn: Callable[..., Any]
+    media_type: str
+    ext: str
+    max_concurrency: int
+
+
+# keluaran yang formatnya bisa dipilih / mengikuti sumber
+MEDIA_TYPES = {
+    "mp3": "audio/mpeg",
+    "m4a": "audio/mp4",
+    "opus": "audio/ogg",
+    "gif": "image/gif",
+    "webp": "image/webp",
+    "mp4": "video/mp4",
+}
+
+
+SPECS: dict[str, ConverterSpec] = {
+    spec.kind: spec
+    for spec in (
+        ConverterSpec(
+            "pdf-to-word",
+            converter_service.convert_pdf_to_word,
+            "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+            "docx",
+            settings.convert_pdf_concurrency,
+        ),
+        ConverterSpec(
+            "audio-extract",
+            converter_service.extract_audio,
+            "audio/mpeg",
+            "mp3",
+            settings.convert_audio_concurrency,
+        ),
+        ConverterSpec(
+            "video-to-gif",
+            converter_service.video_to_gif,
+            "image/gif",
+            "gif",
+            settings.convert_gif_concurrency,
+        ),
+    )
+}
+
+# progress kasar per tahap; converter-nya sendiri tidak melaporkan kemajuan
+_PROGRESS = {"queued": 0.0, "running": 0.5, "done": 1.0, "failed": 1.0}
+
+# kolom yang disimpan apa adanya; params/info disimpan sebagai JSON
+_COLUMNS = (
+    "id", "kind", "filename", "status", "created_at", "started_at", "finished_at",
+    "output_path", "output_cached", "from_cache", "media_type", "ext", "error", "status_code", "worker_pid",
+)
+
+
+@dataclass
+class ConvertJob:
+    id: str
+    kind: str
+    filename: str
+    params: dict[str, Any]
+    input_path: str | None
+    cache_key: str
+    status: str = "queued"
+    created_at: float = field(default_factory=time.time)
+    started_at: float | None = None
+    finished_at: float | None = None
+    output_path: str | None = None
+    output_cached: bool = False  # output milik result cache, jangan dihapus saat job expired
+    from_cache: bool = False
+    media_type: str | None = None
+    ext: str | None = None
+    info: dict[str, Any] = field(default_factory=dict)
+    error: str | None = None
+    status_code: int | None = None
+    worker_pid: int = field(default_factory=os.getpid)
+    done: asyncio.Event = field(default_factory=asyncio.Event)
+
+    @property
+    def spec(self) -> ConverterSpec:
+        return SPECS[self.kind]
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+    def to_row(self) -> dict[str, Any]:
+        row = {name: getattr(self, name) for name in _COLUMNS}
+        row.update(params=json.dumps(self.params), info=json.dumps(self.info))
+        return row
+
+    @classmethod
+    def from_row(cls, row: dict[str, Any]) -> "ConvertJob":
+        """A read-only view of a job accepted by any worker (no input file, `done` already decided)."""
+        fields = {name: row[name] for name in _COLUMNS}
+        fields.update(
+            output_cached=bool(row["output_cached"]),
+            from_cache=bool(row["from_cache"]),
+            params=json.loads(row["params"]),
+            info=json.loads(row["info"]),
+            input_path=None,
+            cache_key="",
+        )
+        job = cls(**fields)
+        if job.status in ("queued", "running") and not _pid_alive(job.worker_pid):
+            # worker yang menerima job mati / di-restart sebelum selesai
+            job.status, job.error, job.status_code = "failed", "Worker exited before the job finished", 503
+            job.finished_at = job.finished_at or time.time()
+        if job.finished:
+            job.done.set()
+        return job
+
+    def to_dict(self) -> dict[str, Any]:
+        now = time.time()
+        return {
+            "id": self.id,
+            "type": self.kind,
+            "status": self.status,
+            "progress": _PROGRESS[self.status],
+            "filename": self.filename,
+            "params": self.params,
+            "created_at": self.created_at,
+            "queue_wait_ms": round(((self.started_at or now) - self.created_at) * 1000, 1),
+            "run_ms": round(((self.finished_at or now) - self.started_at) * 1000, 1) if self.started_at else None,
+            "from_cache": self.from_cache,
+            "info": self.info,
+            "error": self.error,
+            "result_url": f"/api/convert/jobs/{self.id}/result" if self.status == "done" else None,
+        }
+
+
+def _pid_alive(pid: int) -> bool:
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # ada tapi bukan milik kita (EPERM)
+        return True
+    return True
+
+
+class ConvertJobStore:
+    """
+    Job rows in the result cache's SQLite index, so a job accepted by one
+    uvicorn worker can be polled and downloaded through any other worker on
+    the host. When the index can't be read, the worker that owns a job still
+    serves it from memory.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.db = SQLiteDB(
+            path,
+            schema=(
+                "CREATE TABLE IF NOT EXISTS convert_jobs ("
+                " id TEXT PRIMARY KEY, kind TEXT NOT NULL, filename TEXT NOT NULL, params TEXT NOT NULL,"
+                " status TEXT NOT NULL, created_at REAL NOT NULL, started_at REAL, finished_at REAL,"
+                " output_path TEXT, output_cached INTEGER NOT NULL, from_cache INTEGER NOT NULL,"
+                " media_type TEXT, ext TEXT, info TEXT NOT NULL, error TEXT, status_code INTEGER,"
+                " worker_pid INTEGER NOT NULL)",
+                "CREATE INDEX IF NOT EXISTS convert_jobs_finished ON convert_jobs (finished_at)",
+            ),
+            row_factory=sqlite3.Row,
+        )
+
+    def save(self, job: ConvertJob) -> None:
+        row = job.to_row()
+        self.db.execute(
+            f"INSERT OR REPLACE INTO convert_jobs ({', '.join(row)}) VALUES ({', '.join('?' * len(row))})",
+            tuple(row.values()),
+        )
+
+    def load(self, job_id: str) -> ConvertJob | None:
+        row = self.db.fetchone("SELECT * FROM convert_jobs WHERE id = ?", (job_id,))
+        return ConvertJob.from_row(dict(row)) if row is not None else None
+
+    def delete(self, job_id: str) -> None:
+        self.db.execute("DELETE FROM convert_jobs WHERE id = ?", (job_id,))
+
+    def pop_expired(self, before: float) -> list[tuple[str, str | None, bool]]:
+        """Delete jobs finished before `before`; returns (id, output_path, output_cached) of each."""
+        rows = self.db.fetchall(
+            "SELECT id, output_path, output_cached FROM convert_jobs WHERE finished_at < ?", (before,)
+        )
+        if not rows:
+            return []
+        self.db.execute("DELETE FROM convert_jobs WHERE finished_at < ?", (before,))
+        return [(r["id"], r["output_path"], bool(r["output_cached"])) for r in rows]
+
+    def active_counts(self) -> dict[tuple[str, str], int] | None:
+        rows = self.db.fetchall(
+            "SELECT kind, status, worker_pid, COUNT(*) AS n FROM convert_jobs"
+            " WHERE status IN ('queued', 'running') GROUP BY kind, status, worker_pid"
+        )
+        if rows is None:
+            return None
+        counts: dict[tuple[str, str], int] = {}
+        for r in rows:
+            if _pid_alive(r["worker_pid"]):
+                counts[(r["kind"], r["status"])] = counts.get((r["kind"], r["status"]), 0) + r["n"]
+        return counts
+
+
+class ConvertJobManager:
+    """
+    Runs converter jobs on a bounded process pool so long conversions never
+    block the event loop. Each job type has its own concurrency limit, at most
+    `max_pending` jobs may wait, and finished jobs (with their outputs) are
+    forgotten after `ttl_seconds`. Outputs go through the disk result cache,
+    so re-submitting the same file finishes immediately.
+
+    The worker that accepted a job runs it and keeps it in memory; every state
+    change is also written to `store`, which is what other workers read.
+    """
+
+    def __init__(self, max_pending: int, ttl_seconds: float, store: ConvertJobStore) -> None:
+        self.max_pending = max_pending
+        self.ttl_seconds = ttl_seconds
+        self.store = store
+        self._last_store_sweep = 0.0
+        self.pool = BoundedExecutor(
+            name="converter",
+            kind="process",
+            max_concurrency=settings.convert_workers,
+            # antrian sebenarnya ada di semaphore per tipe; pool tidak perlu menolak
+            max_queue=sum(spec.max_concurrency for spec in SPECS.values()),
+            timeout_seconds=settings.convert_job_timeout_seconds,
+            retry_after_seconds=settings.convert_retry_after_seconds,
+        )
+        self._jobs: dict[str, ConvertJob] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self._sems: dict[str, asyncio.Semaphore] = {}
+        self.counters = {"submitted": 0, "done": 0, "failed": 0, "rejected": 0, "cache_hits": 0}
+
+    def start(self) -> None:
+        self.pool.start()
+
+    def shutdown(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        self.pool.shutdown()
+
+    def _sem(self, kind: str) -> asyncio.Semaphore:
+        sem = self._sems.get(kind)
+        if sem is None:
+            sem = self._sems[kind] = asyncio.Semaphore(max(1, SPECS[kind].max_concurrency))
+        return sem
+
+    def pending(self) -> int:
+        return sum(1 for job in self._jobs.values() if job.status in ("queued", "running"))
+
+    async def submit(self, kind: str, file: UploadFile, params: dict[str, Any] | None = None) -> ConvertJob:
+        if kind not in SPECS:
+            raise HTTPException(status_code=400, detail={"ok": False, "error": f"Unknown converter type: {kind}"})
+        self.sweep()
+        if self.pending() >= self.max_pending:
+            self.counters["rejected"] += 1
+            raise HTTPException(
+                status_code=503,
+                detail={"ok": False, "error": "Converter queue is full, try again later"},
+                headers={"Retry-After": str(settings.convert_retry_after_seconds)},
+            )
+
+        params = params or {}
+        # upload bisa ratusan MB: salin + hash di thread
+        input_path, digest = await asyncio.to_thread(converter_service.save_upload_hashed, file)
+        job = ConvertJob(
+            id=uuid.uuid4().hex,
+            kind=kind,
+            filename=file.filename or "file",
+            params=params,
+            input_path=input_path,
+            cache_key=result_cache.key(kind, digest, **params),
+        )
+        self._jobs[job.id] = job
+        self.counters["submitted"] += 1
+
+        hit = await asyncio.to_thread(result_cache.get, job.cache_key)
+        if hit is not None:
+            self.counters["cache_hits"] += 1
+            job.from_cache = True
+            job.started_at = time.time()
+            ext = next((e for e, mt in MEDIA_TYPES.items() if mt == hit.media_type), job.spec.ext)
+            self._finish(job, "done", output_path=hit.path, output_cached=True, media_type=hit.media_type, ext=ext)
+            await asyncio.to_thread(self.store.save, job)
+            return job
+
+        await asyncio.to_thread(self.store.save, job)
+        task = asyncio.create_task(self._run(job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    async def _run(self, job: ConvertJob) -> None:
+        try:
+            async def started() -> None:
+                # baru "running" setelah dapat slot process pool, bukan saat lolos limit per tipe
+                job.status = "running"
+                job.started_at = time.time()
+                await asyncio.to_thread(self.store.save, job)
+
+            async with self._sem(job.kind):
+                result = await self.pool.run(job.spec.fn, job.input_path, on_start=started, **job.params)
+            output_path, info = result if isinstance(result, tuple) else (result, {})
+            ext = os.path.splitext(output_path)[1].lstrip(".") or job.spec.ext
+            media_type = MEDIA_TYPES.get(ext, job.spec.media_type)
+            done = {"ext": ext, "media_type": media_type, "info": info}
+            entry = await asyncio.to_thread(result_cache.put_file, job.cache_key, output_path, media_type)
+            if entry is None:
+                self._finish(job, "done", output_path=output_path, **done)
+            else:
+                self._finish(job, "done", output_path=entry.path, output_cached=True, **done)
+        except HTTPException as e:
+            # 504 timeout / 503 worker crash dari pool
+            error = e.detail.get("error") if isinstance(e.detail, dict) else str(e.detail)
+            self._finish(job, "failed", error=error, status_code=e.status_code)
+        except asyncio.CancelledError:
+            self._finish(job, "failed", error="Server shutting down", status_code=503)
+            # loop sedang berhenti, simpan langsung
+            self.store.save(job)
+            raise
+        except Exception as e:
+            # ConversionError membawa status sendiri (400/413 untuk input yang tidak bisa diproses)
+            self._finish(job, "failed", error=str(e), status_code=getattr(e, "status_code", 500))
+        await asyncio.to_thread(self.store.save, job)
+
+    def _finish(self, job: ConvertJob, status: str, **fields: Any) -> None:
+        for name, value in fields.items():
+            setattr(job, name, value)
+        job.status = status
+        job.finished_at = time.time()
+        self.counters[status] += 1
+        if job.input_path:
+            converter_service.cleanup(job.input_path)
+            job.input_path = None
+        job.done.set()
+
+    def get(self, job_id: str) -> ConvertJob | None:
+        """The live job when this worker accepted it, else its row written by another worker."""
+        self.sweep()
+        return self._jobs.get(job_id) or self.store.load(job_id)
+
+    async def wait(self, job: ConvertJob) -> ConvertJob:
+        await job.done.wait()
+        return job
+
+    def discard(self, job_id: str) -> None:
+        job = self._jobs.pop(job_id, None)
+        self.store.delete(job_id)
+        if job is not None and job.output_path and not job.output_cached:
+            converter_service.cleanup(job.output_path)
+
+    def sweep(self) -> int:
+        now = time.time()
+        cutoff = now - self.ttl_seconds
+        expired = [j.id for j in self._jobs.values() if j.finished_at is not None and j.finished_at < cutoff]
+        for job_id in expired:
+            self.discard(job_id)
+        # job milik worker lain (atau worker yang sudah mati); cukup sesekali
+        if now - self._last_store_sweep >= 60:
+            self._last_store_sweep = now
+            for _, output_path, output_cached in self.store.pop_expired(cutoff):
+                if output_path and not output_cached:
+                    converter_service.cleanup(output_path)
+        return len(expired)
+
+    def stats(self) -> dict[str, Any]:
+        per_type: dict[str, dict[str, int]] = {
+            kind: {"limit": spec.max_concurrency, "queued": 0, "running": 0} for kind, spec in SPECS.items()
+        }
+        # antrian semua worker di host; kalau index tidak terbaca, cukup worker ini
+        counts = self.store.active_counts()
+        if counts is None:
+            counts = {}
+            for job in self._jobs.values():
+                if job.status in ("queued", "running"):
+                    counts[(job.kind, job.status)] = counts.get((job.kind, job.status), 0) + 1
+        for (kind, status), n in counts.items():
+            if kind in per_type:
+                per_type[kind][status] = n
+        return {
+            **self.counters,
+            "pending": self.pending(),
+            "max_pending": self.max_pending,
+            "jobs": len(self._jobs),
+            "types": per_type,
+            "pool": self.pool.stats(),
+        }
+
+
+convert_jobs = ConvertJobManager(
+    max_pending=settings.convert_max_pending_jobs,
+    ttl_seconds=settings.convert_job_ttl_seconds,
+    store=ConvertJobStore(result_cache.index_path),
+)
@@ -1,55 +1,374 @@
+import hashlib
+import json
+import multiprocessing
 import os
+import re
 import shutil
+import subprocess
 import tempfile
+from dataclasses import dataclass
+from time import perf_counter
 from fastapi import UploadFile, HTTPException
 from pdf2docx import Converter as PdfConverter
-from moviepy import VideoFileClip, AudioFileClip
+import imageio_ffmpeg
+
+from app.core.config import settings
+
+class ConversionError(Exception):
+    """Conversion failure raised inside worker processes (picklable, unlike HTTPException)."""
+
+    status_code = 500
+
+
+class ConversionInputError(ConversionError):
+    """The request asked for something the input can't satisfy (e.g. pages out of range)."""
+
+    status_code = 400
+
+
+class PageLimitError(ConversionInputError):
+    status_code = 413
+
+
+# format keluaran audio: codec sumber yang bisa di-copy apa adanya + encoder untuk fallback
+AUDIO_FORMATS = {
+    "m4a": {"copy_codecs": {"aac", "alac"}, "encode": ["-c:a", "aac"], "extra": ["-movflags", "+faststart"]},
+    "opus": {"copy_codecs": {"opus"}, "encode": ["-c:a", "libopus"], "extra": []},
+    "mp3": {"copy_codecs": {"mp3"}, "encode": ["-c:a", "libmp3lame"], "extra": []},
+}
+# format=auto: container yang cocok untuk codec sumber; codec lain di-encode ke mp3 seperti dulu
+_AUTO_FORMAT = {"aac": "m4a", "alac": "m4a", "opus": "opus", "mp3": "mp3"}
+_DEFAULT_AUDIO_BITRATE = "192k"
+
+# argumen encoder untuk keluaran video-to-gif selain GIF (yang lewat palettegen/paletteuse)
+ANIMATION_FORMATS = {
+    "webp": ["-c:v", "libwebp", "-lossless", "0", "-q:v", "70", "-loop", "0"],
+    "mp4": ["-c:v", "libx264", "-preset", "veryfast", "-crf", "26", "-pix_fmt", "yuv420p", "-movflags", "+faststart"],
+}
+
+
+def ffmpeg_exe() -> str:
+    # imageio-ffmpeg ikut terpasang bersama moviepy
+    return shutil.which("ffmpeg") or imageio_ffmpeg.get_ffmpeg_exe()
+
+
+def probe_audio_codec(path: str) -> str | None:
+    """Codec of the first audio stream (ffprobe if installed, else parsed from `ffmpeg -i`)."""
+    ffprobe = shutil.which("ffprobe")
+    if ffprobe:
+        out = subprocess.run(
+            [ffprobe, "-v", "error", "-select_streams", "a:0", "-show_entries", "stream=codec_name",
+             "-of", "default=nw=1:nk=1", path],
+            capture_output=True, text=True, timeout=30,
+        )
+        return out.stdout.strip() or None
+    # tanpa file output ffmpeg keluar dengan error, tapi info stream tetap dicetak ke stderr
+    out = subprocess.run([ffmpeg_exe(), "-hide_banner", "-i", path], capture_output=True, text=True, timeout=30)
+    m = re.search(r"Stream #\d+:\d+.*?: Audio: (\w+)", out.stderr)
+    return m.group(1) if m else None
+
+
+@dataclass(frozen=True)
+class VideoProbe:
+    duration: float | None
+    # lebar frame setelah ffmpeg auto-rotate, sama dengan `iw` di filter
+    width: int | None
+
+
+def _rotated(rotation: float) -> bool:
+    return round(abs(rotation)) % 180 == 90
+
+
+def probe_video(path: str) -> VideoProbe:
+    """Container duration and first video stream width (ffprobe if installed, else parsed from `ffmpeg -i`)."""
+    ffprobe = shutil.which("ffprobe")
+    if ffprobe:
+        out = subprocess.run(
+            [ffprobe, "-v", "error", "-select_streams", "v:0",
+             "-show_entries", "format=duration:stream=width,height:stream_tags=rotate:stream_side_data=rotation",
+             "-of", "json", path],
+            capture_output=True, text=True, timeout=30,
+        )
+        try:
+            data = json.loads(out.stdout or "{}")
+        except ValueError:
+            data = {}
+        try:
+            duration = float(data.get("format", {}).get("duration"))
+        except (TypeError, ValueError):
+            duration = None
+        stream = (data.get("streams") or [{}])[0]
+        width, height = stream.get("width"), stream.get("height")
+        rotations = [float(sd.get("rotation", 0)) for sd in stream.get("side_data_list") or []]
+        rotations.append(float((stream.get("tags") or {}).get("rotate", 0)))
+        if width and height and any(_rotated(r) for r in rotations):
+            width = height
+        return VideoProbe(duration, width)
+    out = subprocess.run([ffmpeg_exe(), "-hide_banner", "-i", path], capture_output=True, text=True, timeout=30)
+    m = re.search(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)", out.stderr)
+    duration = int(m.group(1)) * 3600 + int(m.group(2)) * 60 + float(m.group(3)) if m else None
+    m = re.search(r"Stream #\d+:\d+.*?: Video: .*?, (\d+)x(\d+)", out.stderr)
+    width = None
+    if m:
+        width, height = int(m.group(1)), int(m.group(2))
+        rot = re.search(r"(?:rotation of|rotate\s*:)\s*(-?\d+(?:\.\d+)?)", out.stderr)
+        if rot and _rotated(float(rot.group(1))):
+            width = height
+    return VideoProbe(duration, width)
+
+
+def _run_ffmpeg(args: list[str]) -> None:
+    out = subprocess.run(
+        [ffmpeg_exe(), "-hide_banner", "-loglevel", "error", "-nostdin", "-y", *args],
+        capture_output=True, text=True,
+    )
+    if out.returncode != 0:
+        raise ConversionError(out.stderr.strip().splitlines()[-1] if out.stderr.strip() else "ffmpeg failed")
+
+
+_MAX_PAGE_NUMBER = 100_000
+
+
+def parse_page_ranges(spec: str) -> list[int]:
+    """Parse a 1-based page list like "1-3,7,10-12" into sorted 0-based indexes."""
+    indexes: set[int] = set()
+    for part in spec.replace(" ", "").split(","):
+        if not part:
+            continue
+        first, sep, last = part.partition("-")
+        try:
+            lo, hi = int(first), int(last) if sep else int(first)
+        except ValueError:
+            raise ValueError(f"Invalid page range: {part}") from None
+        # batas atas supaya "1-999999999" tidak membangun set raksasa sebelum cek PDF_MAX_PAGES
+        if lo < 1 or hi < lo or hi > _MAX_PAGE_NUMBER:
+            raise ValueError(f"Invalid page range: {part}")
+        indexes.update(range(lo - 1, hi))
+    if not indexes:
+        raise ValueError("No pages given")
+    return sorted(indexes)
+
+
+def format_page_ranges(indexes: list[int]) -> str:
+    """Inverse of `parse_page_ranges`: sorted 0-based indexes back to "1-3,7"."""
+    parts: list[list[int]] = []
+    for i in indexes:
+        if parts and parts[-1][1] == i - 1:
+            parts[-1][1] = i
+        else:
+            parts.append([i, i])
+    return ",".join(f"{lo + 1}" if lo == hi else f"{lo + 1}-{hi + 1}" for lo, hi in parts)
+
+
+def _parse_pdf_pages(cv: PdfConverter, options: dict) -> dict[int, float]:
+    """Same as `Converter.parse_pages`, but records how long each page took (ms, keyed by 1-based page)."""
+    timings: dict[int, float] = {}
+    for page in cv.pages:
+        if page.skip_parsing:
+            continue
+        t0 = perf_counter()
+        try:
+            page.parse(**options)
+        except Exception as e:
+            if not options["ignore_page_error"]:
+                raise ConversionError(f"Error when parsing page {page.id + 1}: {e}")
+        timings[page.id + 1] = round((perf_counter() - t0) * 1000, 1)
+    return timings
+
+
+def _parse_pdf_shard(pdf_path: str, indexes: list[int], json_path: str) -> dict[int, float]:
+    # jalan di proses anak: parse sebagian halaman, hasil layout disimpan ke JSON untuk digabung
+    cv = PdfConverter(pdf_path)
+    try:
+        options = cv.default_settings
+        cv.load_pages(pages=indexes).parse_document(**options)
+        timings = _parse_pdf_pages(cv, options)
+        cv.serialize(json_path)
+        return timings
+    finally:
+        cv.close()
+
 
 class ConverterService:
     def _save_upload_file(self, upload_file: UploadFile) -> str:
+        return self.save_upload_hashed(upload_file)[0]
+
+    def save_upload_hashed(self, upload_file: UploadFile) -> tuple[str, str]:
+        """Save the upload to a temp file, returning (path, sha256) hashed while copying."""
         try:
             # Create a unique temp file
             fd, path = tempfile.mkstemp()
+            h = hashlib.sha256()
             with os.fdopen(fd, 'wb') as tmp:
-                shutil.copyfileobj(upload_file.file, tmp)
-            return path
+                while chunk := upload_file.file.read(1024 * 1024):
+                    h.update(chunk)
+                    tmp.write(chunk)
+            return path, h.hexdigest()
         except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Failed to save upload file: {str(e)}")
+            raise HTTPException(status_code=500, detail={"ok": False, "error": f"Failed to save upload file: {str(e)}"})
 
-    def convert_pdf_to_word(self, file_path: str) -> str:
+    def convert_pdf_to_word(
+        self, file_path: str, start: int | None = None, end: int | None = None, pages: str | None = None
+    ) -> tuple[str, dict]:
+        """
+        Convert a PDF (or some of its pages) to DOCX. `start`/`end` are 1-based
+        and inclusive, `pages` ("1-3,7") wins over them. Large selections are
+        split into contiguous shards parsed by up to PDF_WORKERS processes,
+        then merged into one document. Returns (path, info) with per-page
+        parse times in ms.
+        """
         docx_path = file_path + ".docx"
+        t0 = perf_counter()
         try:
             cv = PdfConverter(file_path)
-            cv.convert(docx_path)
-            cv.close()
-            return docx_path
+            try:
+                page_count = len(cv.fitz_doc)
+                if pages:
+                    indexes = parse_page_ranges(pages)
+                else:
+                    indexes = list(range((start or 1) - 1, min(end or page_count, page_count)))
+                if not indexes:
+                    raise ConversionInputError("No pages selected")
+                if indexes[-1] >= page_count:
+                    raise ConversionInputError(f"Requested pages are outside the document ({page_count} pages)")
+                if len(indexes) > settings.pdf_max_pages:
+                    raise PageLimitError(f"{len(indexes)} pages requested, limit is {settings.pdf_max_pages}")
+
+                options = cv.default_settings
+                workers = max(1, min(settings.pdf_workers, -(-len(indexes) // max(1, settings.pdf_pages_per_worker))))
+                cv.load_pages(pages=indexes)
+                if workers == 1:
+                    cv.parse_document(**options)
+                    timings = _parse_pdf_pages(cv, options)
+                else:
+                    timings = self._parse_pdf_sharded(cv, file_path, indexes, workers)
+                t1 = perf_counter()
+                cv.make_docx(docx_path, **options)
+                make_ms = round((perf_counter() - t1) * 1000, 1)
+            finally:
+                cv.close()
+            return docx_path, {
+                "page_count": page_count,
+                "pages": len(indexes),
+                "workers": workers,
+                "parse_ms": round(sum(timings.values()), 1),
+                "make_docx_ms": make_ms,
+                "total_ms": round((perf_counter() - t0) * 1000, 1),
+                "page_ms": timings,
+            }
+        except ConversionError:
+            raise
         except Exception as e:
-            raise HTTPException(status_code=500, detail=f"PDF conversion failed: {str(e)}")
+            raise ConversionError(f"PDF conversion failed: {str(e)}")
 
-    def extract_audio(self, file_path: str) -> str:
-        audio_path = file_path + ".mp3"
+    def _parse_pdf_sharded(self, cv: PdfConverter, file_path: str, indexes: list[int], workers: int) -> dict[int, float]:
+        # multi_processing bawaan pdf2docx menulis pages-N.json di cwd (bentrok antar job) dan
+        # hanya untuk rentang kontinu, jadi sharding dilakukan sendiri
+        size = -(-len(indexes) // workers)
+        shards = [indexes[i:i + size] for i in range(0, len(indexes), size)]
+        tmp_dir = tempfile.mkdtemp(prefix="pdf2docx-")
         try:
-            # Load video file
-            video = VideoFileClip(file_path)
-            # Write audio
-            video.audio.write_audiofile(audio_path, logger=None)
-            video.close()
-            return audio_path
+            json_paths = [os.path.join(tmp_dir, f"shard-{i}.json") for i in range(len(shards))]
+            with multiprocessing.get_context("spawn").Pool(len(shards)) as pool:
+                results = pool.starmap(_parse_pdf_shard, zip([file_path] * len(shards), shards, json_paths))
+            for json_path in json_paths:
+                cv.deserialize(json_path)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        return {page: ms for timings in results for page, ms in timings.items()}
+
+    def extract_audio(self, file_path: str, format: str = "auto", bitrate: str | None = None) -> tuple[str, dict]:
+        """
+        Extract the first audio track. When the source codec fits the output
+        container (and no bitrate is forced) the stream is copied without
+        re-encoding; otherwise it is encoded. Returns (path, info) where info
+        says which path was taken.
+        """
+        try:
+            codec = probe_audio_codec(file_path)
+            if codec is None:
+                raise ConversionInputError("No audio stream found")
+            if format == "auto":
+                format = _AUTO_FORMAT.get(codec, "mp3") if bitrate is None else "mp3"
+            spec = AUDIO_FORMATS[format]
+            audio_path = f"{file_path}.{format}"
+            if codec in spec["copy_codecs"] and bitrate is None:
+                mode, codec_args = "copy", ["-c:a", "copy"]
+            else:
+                mode, codec_args = "encode", [*spec["encode"], "-b:a", bitrate or _DEFAULT_AUDIO_BITRATE]
+            _run_ffmpeg(["-i", file_path, "-vn", "-map", "0:a:0", *codec_args, *spec["extra"], audio_path])
+            return audio_path, {"mode": mode, "source_codec": codec, "format": format}
+        except ConversionError:
+            raise
         except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Audio extraction failed: {str(e)}")
-
-    def video_to_gif(self, file_path: str) -> str:
-        gif_path = file_path + ".gif"
-        try:
-            video = VideoFileClip(file_path)
-            # Resize to reduce size, or keep original? Let's make it manageable
-            # For utility, maybe limit to 10 seconds or resize?
-            # Doing simple conversion for now.
-            video.write_gif(gif_path, logger=None)
-            video.close()
-            return gif_path
+            raise ConversionError(f"Audio extraction failed: {str(e)}")
+
+    def video_to_gif(
+        self,
+        file_path: str,
+        format: str = "gif",
+        fps: int | None = None,
+        width: int | None = None,
+        start: float = 0.0,
+        duration: float | None = None,
+    ) -> tuple[str, dict]:
+        """
+        Convert a clip to an animation with ffmpeg, frame by frame, so memory
+        does not grow with clip length. fps/width/duration are clamped to the
+        GIF_MAX_* settings. GIF output uses a two-pass palette (palettegen,
+        then paletteuse); webp/mp4 are encoded directly. Returns (path, info)
+        with the effective parameters: width is never above the source width,
+        duration is bounded by what is left of the clip after `start`.
+        """
+        fps = min(fps or settings.gif_default_fps, settings.gif_max_fps)
+        width = min(width or settings.gif_default_width, settings.gif_max_width)
+        duration = min(duration or settings.gif_max_duration_seconds, settings.gif_max_duration_seconds)
+        start = max(start, 0.0)
+        out_path = f"{file_path}.{format}"
+        try:
+            probe = probe_video(file_path)
+            source_duration = probe.duration
+            if probe.width:
+                # tidak upscale video yang lebih kecil; lebar dilaporkan apa adanya
+                width = min(width, probe.width)
+            # lebar genap: yuv420p (mp4) menolak dimensi ganjil; tinggi genap lewat -2
+            width = max(2, width // 2 * 2)
+            if probe.width:
+                scale = f"fps={fps},scale={width}:-2:flags=lanczos"
+            else:
+                scale = f"fps={fps},scale='min({width},iw)':-2:flags=lanczos"
+            if source_duration is not None:
+                if start >= source_duration:
+                    raise ConversionInputError(f"start ({start:g}s) is past the end of the clip ({source_duration:g}s)")
+                duration = round(min(duration, source_duration - start), 3)
+            # -ss/-t sebagai opsi input: ffmpeg berhenti decode setelah durasi, tidak baca seluruh file
+            trim = ["-ss", f"{start:g}", "-t", f"{duration:g}", "-i", file_path]
+            if format == "gif":
+                palette_path = file_path + ".palette.png"
+                try:
+                    _run_ffmpeg([*trim, "-vf", f"{scale},palettegen=stats_mode=diff", palette_path])
+                    _run_ffmpeg([
+                        *trim, "-i", palette_path,
+                        "-lavfi", f"{scale}[x];[x][1:v]paletteuse=dither=bayer:bayer_scale=5:diff_mode=rectangle",
+                        "-loop", "0", out_path,
+                    ])
+                finally:
+                    self.cleanup(palette_path)
+            else:
+                _run_ffmpeg([*trim, "-vf", scale, "-an", *ANIMATION_FORMATS[format], out_path])
+            return out_path, {
+                "format": format,
+                "fps": fps,
+                "width": width,
+                "source_width": probe.width,
+                "start": start,
+                "duration": duration,
+                "source_duration": source_duration,
+            }
+        except ConversionInputError:
+            raise
         except Exception as e:
-            raise HTTPException(status_code=500, detail=f"GIF conversion failed: {str(e)}")
+            raise ConversionError(f"GIF conversion failed: {str(e)}")
 
     def cleanup(self, *paths):
         for path in paths:
@@ -2,8 +2,8 @@ import base64
 import json
 import time
 import os
-import httpx
 from fastapi import HTTPException
+from app.core.http_clients import http_clients
 
 # Constants matching the original wrapper
 CLIENT_ID = "Iv1.b507a08c87ecfe98"
@@ -70,48 +70,48 @@ class CopilotService:
 
     async def start_device_auth(self):
         """Step 1: Get device code"""
-        async with httpx.AsyncClient() as client:
-            resp = await client.post(
-                DEVICE_CODE_URL,
-                headers={
-                    'accept': 'application/json',
-                    'editor-version': EDITOR_VERSION,
-                    'editor-plugin-version': EDITOR_PLUGIN_VERSION,
-                    'content-type': 'application/json',
-                    'user-agent': USER_AGENT,
-                },
-                json={"client_id": CLIENT_ID, "scope": SCOPE}
-            )
-            resp.raise_for_status()
-            return resp.json()
+        client = http_clients.get("copilot")
+        resp = await client.post(
+            DEVICE_CODE_URL,
+            headers={
+                'accept': 'application/json',
+                'editor-version': EDITOR_VERSION,
+                'editor-plugin-version': EDITOR_PLUGIN_VERSION,
+                'content-type': 'application/json',
+                'user-agent': USER_AGENT,
+            },
+            json={"client_id": CLIENT_ID, "scope": SCOPE}
+        )
+        resp.raise_for_status()
+        return resp.json()
 
     async def check_device_auth(self, device_code: str):
         """Step 2: Poll/Check for access token"""
-        async with httpx.AsyncClient() as client:
-            resp = await client.post(
-                ACCESS_TOKEN_URL,
-                headers={
-                    'accept': 'application/json',
-                    'editor-version': EDITOR_VERSION,
-                    'editor-plugin-version': EDITOR_PLUGIN_VERSION,
-                    'content-type': 'application/json',
-                    'user-agent': USER_AGENT,
-                },
-                json={
-                    "client_id": CLIENT_ID,
-                    "device_code": device_code,
-                    "grant_type": "urn:ietf:params:oauth:grant-type:device_code"
-                }
-            )
-            resp.raise_for_status()
-            data = resp.json()
+        client = http_clients.get("copilot")
+        resp = await client.post(
+            ACCESS_TOKEN_URL,
+            headers={
+                'accept': 'application/json',
+                'editor-version': EDITOR_VERSION,
+                'editor-plugin-version': EDITOR_PLUGIN_VERSION,
+                'content-type': 'application/json',
+                'user-agent': USER_AGENT,
+            },
+            json={
+                "client_id": CLIENT_ID,
+                "device_code": device_code,
+                "grant_type": "urn:ietf:params:oauth:grant-type:device_code"
+            }
+        )
+        resp.raise_for_status()
+        data = resp.json()
             
-            if "access_token" in data:
-                self._save_access_token(data["access_token"])
-                return {"status": "success", "access_token": "Saved internally"}
-            elif "error" in data:
-                 return {"status": "pending", "error": data.get("error_description", data["error"])}
-            return data
+        if "access_token" in data:
+            self._save_access_token(data["access_token"])
+            return {"status": "success", "access_token": "Saved internally"}
+        elif "error" in data:
+             return {"status": "pending", "error": data.get("error_description", data["error"])}
+        return data
 
     async def get_copilot_token(self):
         """Get the internal Copilot token (expires every 30m usually)"""
@@ -123,66 +123,66 @@ class CopilotService:
         if not access_token:
             raise HTTPException(status_code=401, detail="Not authenticated. Please perform device login first.")
 
-        async with httpx.AsyncClient() as client:
-            resp = await client.get(
-                TOKEN_URL,
-                headers={
-                    'authorization': f'token {access_token}',
-                    'editor-version': EDITOR_VERSION,
-                    'editor-plugin-version': EDITOR_PLUGIN_VERSION,
-                    'user-agent': USER_AGENT
-                }
-            )
-            if resp.status_code != 200:
-                 raise HTTPException(status_code=401, detail=f"Failed to get copilot token: {resp.text}")
+        client = http_clients.get("copilot")
+        resp = await client.get(
+            TOKEN_URL,
+            headers={
+                'authorization': f'token {access_token}',
+                'editor-version': EDITOR_VERSION,
+                'editor-plugin-version': EDITOR_PLUGIN_VERSION,
+                'user-agent': USER_AGENT
+            }
+        )
+        if resp.status_code != 200:
+             raise HTTPException(status_code=401, detail=f"Failed to get copilot token: {resp.text}")
             
-            data = resp.json()
-            self._copilot_token = data.get('token')
-            # Rudimentary expiry check (default to 25 mins to be safe)
-            self._copilot_token_expiry = current_time + (25 * 60)
-            return self._copilot_token
+        data = resp.json()
+        self._copilot_token = data.get('token')
+        # Rudimentary expiry check (default to 25 mins to be safe)
+        self._copilot_token_expiry = current_time + (25 * 60)
+        return self._copilot_token
 
     async def chat_completions(self, messages: list, model: str = "gpt-4o"):
         token = await self.get_copilot_token()
         
-        async with httpx.AsyncClient() as client:
-            async with client.stream(
-                "POST",
-                CHAT_URL,
-                headers={
-                    'Authorization': f'Bearer {token}',
-                    'Content-Type': 'application/json',
-                    'Accept': 'application/json',
-                    'Editor-Version': 'vscode/1.95.3',
-                    'Editor-Plugin-Version': 'copilot-chat/0.22.4',
-                    'Openai-Intent': 'conversation-panel',
-                    'X-Github-Api-Version': '2023-07-07'
-                },
-                json={
-                    'messages': messages,
-                    'model': model,
-                    'temperature': 0,
-                    'stream': True,
-                    'n': 1
-                },
-                timeout=60.0
-            ) as resp:
-                if resp.status_code != 200:
-                    error_text = await resp.read()
-                    raise HTTPException(status_code=resp.status_code, detail=f"Copilot API error: {error_text.decode('utf-8')}")
+        client = http_clients.get("copilot")
+        async with client.stream(
+            "POST",
+            CHAT_URL,
+            headers={
+                'Authorization': f'Bearer {token}',
+                'Content-Type': 'application/json',
+                'Accept': 'application/json',
+                'Editor-Version': 'vscode/1.95.3',
+                'Editor-Plugin-Version': 'copilot-chat/0.22.4',
+                'Openai-Intent': 'conversation-panel',
+                'X-Github-Api-Version': '2023-07-07'
+            },
+            json={
+                'messages': messages,
+                'model': model,
+                'temperature': 0,
+                'stream': True,
+                'n': 1
+            },
+            timeout=60.0
+        ) as resp:
+            if resp.status_code != 200:
+                error_text = await resp.read()
+                raise HTTPException(status_code=resp.status_code, detail=f"Copilot API error: {error_text.decode('utf-8')}")
 
-                async for line in resp.aiter_lines():
-                    if line.startswith("data: "):
-                        data_str = line[6:]
-                        if data_str.strip() == "[DONE]":
-                            break
-                        try:
-                            data_json = json.loads(data_str)
-                            if data_json.get('choices'):
-                                content = data_json['choices'][0].get('delta', {}).get('content', '')
-                                if content:
-                                    yield content
-                        except json.JSONDecodeError:
-                            continue
+            async for line in resp.aiter_lines():
+                if line.startswith("data: "):
+                    data_str = line[6:]
+                    if data_str.strip() == "[DONE]":
+                        break
+                    try:
+                        data_json = json.loads(data_str)
+                        if data_json.get('choices'):
+                            content = data_json['choices'][0].get('delta', {}).get('content', '')
+                            if content:
+                                yield content
+                    except json.JSONDecodeError:
+                        continue
 
 copilot_service = CopilotService()
@@ -3,6 +3,8 @@ import os
 from fastapi import HTTPException
 from gemini_webapi import GeminiClient
 
+from app.core.remote_fetch import remote_fetcher
+
 class GeminiWebService:
     def __init__(self, token_file_path: str = ".gemini_cookies"):
         self.token_file_path = token_file_path
@@ -52,19 +54,21 @@ class GeminiWebService:
 
     async def chat(self, message: str, image_url: str = None):
         client = await self.get_client()
+        image_path = None
+        if image_url:
+            # unduh sekali dengan batas ukuran ke file sementara, gemini-webapi upload dari path
+            remote = await remote_fetcher.fetch(image_url, to_file=True)
+            image_path = remote.path
         try:
-            # Note: The library might have slightly different method signatures, 
-            # we assume generate_content based on standard patterns or library update.
-            # Checking library usage via pip install showed it exists, but exact method might vary.
-            # Assuming client.generate_content or client.chat
-            
-            # Based on common usage of such wrappers:
-            response = await client.generate_content(message, image_url=image_url)
+            response = await client.generate_content(message, files=[image_path] if image_path else None)
             return response.text
         except Exception as e:
              # If error suggests auth issue, clear client
              if "401" in str(e) or "unauthorized" in str(e).lower():
                  self._client = None
              raise HTTPException(status_code=500, detail=str(e))
+        finally:
+            if image_path:
+                os.remove(image_path)
 
 gemini_web_service = GeminiWebService()
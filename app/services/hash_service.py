@@ -0,0 +1,86 @@
+import hashlib
+import zlib
+from typing import Any, BinaryIO, Callable
+
+try:
+    import xxhash  # type: ignore
+    XXHASH_AVAILABLE = True
+except Exception:
+    xxhash = None
+    XXHASH_AVAILABLE = False
+
+try:
+    import crc32c  # type: ignore
+    CRC32C_AVAILABLE = True
+except Exception:
+    crc32c = None
+    CRC32C_AVAILABLE = False
+
+
+class _Crc:
+    """hashlib-style wrapper around a running CRC (`zlib.crc32` / `crc32c.crc32c`)."""
+
+    def __init__(self, fn: Callable[[Any, int], int]) -> None:
+        self._fn = fn
+        self._value = 0
+
+    def update(self, data: Any) -> None:
+        self._value = self._fn(data, self._value)
+
+    def hexdigest(self) -> str:
+        return f"{self._value:08x}"
+
+
+ALGORITHMS: dict[str, Callable[[], Any]] = {
+    "md5": hashlib.md5,
+    "sha1": hashlib.sha1,
+    "sha256": hashlib.sha256,
+    "sha512": hashlib.sha512,
+    "blake2b": hashlib.blake2b,
+    "blake2s": hashlib.blake2s,
+    "sha3_256": hashlib.sha3_256,
+    "sha3_512": hashlib.sha3_512,
+    "crc32": lambda: _Crc(zlib.crc32),
+}
+if XXHASH_AVAILABLE:
+    ALGORITHMS["xxh3_64"] = xxhash.xxh3_64
+    ALGORITHMS["xxh3_128"] = xxhash.xxh3_128
+if CRC32C_AVAILABLE:
+    ALGORITHMS["crc32c"] = lambda: _Crc(crc32c.crc32c)
+
+
+def parse_algorithms(raw: str) -> list[str]:
+    algos = list(dict.fromkeys(a.strip().lower() for a in raw.split(",") if a.strip()))
+    unknown = [a for a in algos if a not in ALGORITHMS]
+    if unknown or not algos:
+        raise ValueError(f"Unsupported algorithm(s): {', '.join(unknown) or '-'}; available: {', '.join(ALGORITHMS)}")
+    return algos
+
+
+def hash_stream(fileobj: BinaryIO, algos: list[str], chunk_size: int) -> tuple[dict[str, str], int]:
+    """
+    Compute every digest in `algos` in a single pass over `fileobj`. Chunks
+    are read into one reused buffer and passed as memoryview slices, so no
+    per-chunk bytes objects are allocated; hashlib drops the GIL while it
+    hashes each chunk.
+    """
+    hashers = {a: ALGORITHMS[a]() for a in algos}
+    updates = [h.update for h in hashers.values()]
+    buf = bytearray(chunk_size)
+    view = memoryview(buf)
+    readinto = getattr(fileobj, "readinto", None)
+    size = 0
+    while True:
+        if readinto is not None:
+            n = readinto(buf)
+        else:
+            data = fileobj.read(chunk_size)
+            n = len(data)
+            view[:n] = data
+        if not n:
+            break
+        size += n
+        chunk = view[:n]
+        for update in updates:
+            update(chunk)
+    return {a: h.hexdigest() for a, h in hashers.items()}, size
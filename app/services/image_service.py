@@ -1,22 +1,317 @@
 from __future__ import annotations
 
 import io
-from PIL import Image
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Any, Iterator
+
+import numpy as np
+from PIL import Image, ImageOps
+
+from app.core.config import settings
+from app.core.executors import BoundedExecutor
 
 try:
+    import onnxruntime as ort  # type: ignore
     from rembg import remove  # type: ignore
+    from rembg.bg import naive_cutout  # type: ignore
+    from rembg.sessions import sessions_class  # type: ignore
     REMBG_AVAILABLE = True
 except Exception:
+    ort = None
     remove = None
+    naive_cutout = None
+    sessions_class = []
     REMBG_AVAILABLE = False
 
+# nama pendek yang boleh dipakai di REMBG_MODEL
+_MODEL_ALIASES = {"isnet": "isnet-general-use"}
+
+_IMAGENET_MEAN = (0.485, 0.456, 0.406)
+_IMAGENET_STD = (0.229, 0.224, 0.225)
+
+# (mean, std, sisi input) persis seperti predict() session rembg-nya;
+# model lain tetap jalan lewat remove() per gambar
+_BATCH_SPECS: dict[str, tuple[tuple[float, ...], tuple[float, ...], int]] = {
+    "u2net": (_IMAGENET_MEAN, _IMAGENET_STD, 320),
+    "u2netp": (_IMAGENET_MEAN, _IMAGENET_STD, 320),
+    "u2net_human_seg": (_IMAGENET_MEAN, _IMAGENET_STD, 320),
+    "silueta": (_IMAGENET_MEAN, _IMAGENET_STD, 320),
+    "isnet-general-use": (_IMAGENET_MEAN, (1.0, 1.0, 1.0), 1024),
+    "isnet-anime": (_IMAGENET_MEAN, (1.0, 1.0, 1.0), 1024),
+}
+
+
+class RembgSessionPool:
+    """
+    Keeps loaded rembg/ONNX sessions around so the model is read and the
+    `InferenceSession` built once, not per request. Requests check a session
+    out and give it back; at most `size` sessions are ever created.
+    """
+
+    def __init__(self, model_name: str, size: int, intra_op_threads: int = 0, inter_op_threads: int = 0) -> None:
+        self.model_name = _MODEL_ALIASES.get(model_name, model_name)
+        self.size = max(1, size)
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        self._idle: queue.Queue = queue.Queue()
+        # _created termasuk slot yang modelnya masih di-load; _loaded hanya yang sudah siap
+        self._created = 0
+        self._loaded = 0
+        self._lock = threading.Lock()
+        self.load_seconds: float | None = None
+        self.error: str | None = None
+
+    @property
+    def warm(self) -> bool:
+        return self._loaded > 0
+
+    def _new_session(self) -> Any:
+        session_class = next((sc for sc in sessions_class if sc.name() == self.model_name), None)
+        if session_class is None:
+            raise ValueError(f"Unknown rembg model: {self.model_name}")
+        opts = ort.SessionOptions()
+        # 0 = biarkan onnxruntime pilih sendiri
+        if self.intra_op_threads > 0:
+            opts.intra_op_num_threads = self.intra_op_threads
+        if self.inter_op_threads > 0:
+            opts.inter_op_num_threads = self.inter_op_threads
+        started = time.perf_counter()
+        session = session_class(self.model_name, opts)
+        if self.load_seconds is None:
+            self.load_seconds = round(time.perf_counter() - started, 3)
+        return session
+
+    def _try_reserve(self) -> bool:
+        with self._lock:
+            if self._created >= self.size:
+                return False
+            self._created += 1
+            return True
+
+    def _create(self) -> Any:
+        try:
+            session = self._new_session()
+        except Exception as e:
+            with self._lock:
+                self._created -= 1
+            self.error = str(e)
+            raise
+        with self._lock:
+            self._loaded += 1
+        return session
+
+    def preload(self) -> None:
+        """Load every session up front (model download + ONNX init); meant for app startup."""
+        if not REMBG_AVAILABLE:
+            return
+        try:
+            while self._try_reserve():
+                self._idle.put(self._create())
+        except Exception:
+            # error sudah dicatat di self.error; request berikutnya akan coba load lagi
+            return
+        self.error = None
+
+    @contextmanager
+    def session(self) -> Iterator[Any]:
+        try:
+            session = self._idle.get_nowait()
+        except queue.Empty:
+            session = self._create() if self._try_reserve() else self._idle.get()
+        try:
+            yield session
+        finally:
+            self._idle.put(session)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "available": REMBG_AVAILABLE,
+            "model": self.model_name,
+            "warm": self.warm,
+            "sessions": self._loaded,
+            "loading": self._created - self._loaded,
+            "idle": self._idle.qsize(),
+            "max_sessions": self.size,
+            "load_seconds": self.load_seconds,
+            "error": self.error,
+        }
+
+
+rembg_pool = RembgSessionPool(
+    settings.rembg_model,
+    size=settings.rembg_sessions,
+    intra_op_threads=settings.rembg_intra_op_threads,
+    inter_op_threads=settings.rembg_inter_op_threads,
+)
+
+
+# onnxruntime lepas GIL saat inference -> thread cukup, session tetap di-share lewat rembg_pool
+image_pool = BoundedExecutor(
+    name="image",
+    kind="thread",
+    max_concurrency=settings.image_workers,
+    max_queue=settings.image_max_queue,
+    timeout_seconds=settings.image_job_timeout_seconds,
+    retry_after_seconds=settings.image_retry_after_seconds,
+)
+
+
+@dataclass(frozen=True)
+class RemoveBgOptions:
+    """
+    Output controls for background removal. `max_side` downscales the input
+    before inference (JPEGs are decoded directly at reduced scale); with
+    `full_size` the mask is still computed on the small copy but applied to
+    the original resolution.
+    """
+
+    max_side: int | None = None
+    format: str = "png"
+    quality: int = 90
+    compress_level: int = 6
+    full_size: bool = False
+
+    @property
+    def media_type(self) -> str:
+        return f"image/{self.format}"
+
+    def cache_params(self) -> dict[str, Any]:
+        return asdict(self)
+
 
-def remove_bg_image_bytes(image_bytes: bytes) -> bytes:
+def _downscale(img: Image.Image, max_side: int) -> Image.Image:
+    if max(img.size) <= max_side:
+        return img
+    # reduce(): box filter integer cepat untuk sebagian besar jalan, LANCZOS untuk sisa
+    factor = max(img.size) // max_side
+    if factor >= 2:
+        img = img.reduce(factor)
+    if max(img.size) > max_side:
+        img = img.copy()
+        img.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+    return img
+
+
+def _decode(image_bytes: bytes, options: RemoveBgOptions) -> tuple[Image.Image, Image.Image | None]:
+    """Return (image for inference, original-size image or None) as RGBA."""
+    img = Image.open(io.BytesIO(image_bytes))
+    if options.max_side is None:
+        return ImageOps.exif_transpose(img).convert("RGBA"), None
+    if options.full_size:
+        full = ImageOps.exif_transpose(img).convert("RGBA")
+        return _downscale(full, options.max_side), full
+    if img.format == "JPEG":
+        # decode langsung di skala DCT 1/2..1/8, tidak pernah alokasi resolusi penuh
+        img.draft("RGB", (options.max_side, options.max_side))
+    img = ImageOps.exif_transpose(img)
+    if img.mode not in ("RGB", "RGBA", "L", "LA"):
+        # palette/16-bit dll tidak bisa di-reduce() langsung
+        img = img.convert("RGBA")
+    return _downscale(img, options.max_side).convert("RGBA"), None
+
+
+def _encode(img: Image.Image, options: RemoveBgOptions) -> bytes:
+    buf = io.BytesIO()
+    if options.format == "webp":
+        img.save(buf, format="WEBP", quality=options.quality)
+    else:
+        img.save(buf, format="PNG", compress_level=options.compress_level)
+    return buf.getvalue()
+
+
+def _apply_mask(img: Image.Image, mask: Image.Image, full: Image.Image | None) -> Image.Image:
+    target = full if full is not None else img
+    if mask.size != target.size:
+        mask = mask.resize(target.size, Image.Resampling.LANCZOS)
+    return naive_cutout(target, mask)
+
+
+def remove_bg_image_bytes(image_bytes: bytes, options: RemoveBgOptions | None = None) -> bytes:
     if not REMBG_AVAILABLE or remove is None:
         raise RuntimeError("rembg not installed/available")
 
-    img = Image.open(io.BytesIO(image_bytes)).convert("RGBA")
-    out = remove(img)  # PIL.Image
-    buf = io.BytesIO()
-    out.save(buf, format="PNG")
-    return buf.getvalue()
\ No newline at end of file
+    options = options or RemoveBgOptions()
+    img, full = _decode(image_bytes, options)
+    with rembg_pool.session() as session:
+        if full is None:
+            out = remove(img, session=session)  # PIL.Image
+        else:
+            mask = remove(img, session=session, only_mask=True)
+            out = _apply_mask(img, mask, full)
+    return _encode(out, options)
+
+
+def _preprocess(images: list[Image.Image], mean: tuple[float, ...], std: tuple[float, ...], side: int) -> np.ndarray:
+    """Resize + normalize a group into one NCHW float32 tensor (same math as rembg's normalize)."""
+    arr = np.stack([np.asarray(img.convert("RGB").resize((side, side), Image.Resampling.LANCZOS)) for img in images])
+    x = arr.astype(np.float32)
+    # rembg membagi dengan piksel maksimum tiap gambar, bukan 255
+    x /= np.maximum(x.max(axis=(1, 2, 3), keepdims=True), 1.0)
+    x -= np.asarray(mean, dtype=np.float32)
+    x /= np.asarray(std, dtype=np.float32)
+    return np.ascontiguousarray(x.transpose(0, 3, 1, 2))
+
+
+def _infer(session: Any, batch: np.ndarray) -> tuple[np.ndarray, bool]:
+    """Run the ONNX model on the whole batch; per image if the model has a fixed batch size of 1."""
+    inner = session.inner_session
+    model_input = inner.get_inputs()[0]
+    dim = model_input.shape[0] if model_input.shape else None
+    if len(batch) > 1 and not (isinstance(dim, int) and dim != len(batch)):
+        try:
+            return inner.run(None, {model_input.name: batch})[0], True
+        except Exception:
+            # dimensi batch dinamis di input tapi di-reshape tetap di dalam graph
+            pass
+    outs = [inner.run(None, {model_input.name: batch[i : i + 1]})[0] for i in range(len(batch))]
+    return np.concatenate(outs), False
+
+
+def _masks(preds: np.ndarray) -> np.ndarray:
+    pred = preds[:, 0, :, :]
+    lo = pred.min(axis=(1, 2), keepdims=True)
+    hi = pred.max(axis=(1, 2), keepdims=True)
+    pred = (pred - lo) / np.maximum(hi - lo, 1e-8)
+    return (pred * 255).astype(np.uint8)
+
+
+def remove_bg_batch(
+    images: list[bytes], options: RemoveBgOptions | None = None
+) -> tuple[list[tuple[bytes | None, str | None]], bool]:
+    """
+    Remove backgrounds from a group of images with a single ONNX run.
+
+    Returns one `(image, error)` pair per input, in order (a broken image does
+    not fail the group), and whether inference really ran batched.
+    """
+    if not REMBG_AVAILABLE or remove is None:
+        raise RuntimeError("rembg not installed/available")
+
+    options = options or RemoveBgOptions()
+    results: list[tuple[bytes | None, str | None]] = [(None, None)] * len(images)
+    decoded: list[tuple[int, Image.Image, Image.Image | None]] = []
+    for i, raw in enumerate(images):
+        try:
+            decoded.append((i, *_decode(raw, options)))
+        except Exception as e:
+            results[i] = (None, str(e))
+    if not decoded:
+        return results, False
+
+    spec = _BATCH_SPECS.get(rembg_pool.model_name)
+    if spec is None:
+        with rembg_pool.session() as session:
+            masks = [remove(img, session=session, only_mask=True) for _, img, _ in decoded]
+        batched = False
+    else:
+        batch = _preprocess([img for _, img, _ in decoded], *spec)
+        with rembg_pool.session() as session:
+            preds, batched = _infer(session, batch)
+        masks = [Image.fromarray(mask, mode="L") for mask in _masks(preds)]
+    for (i, img, full), mask in zip(decoded, masks):
+        results[i] = (_encode(_apply_mask(img, mask, full), options), None)
+    return results, batched
@@ -1,6 +1,8 @@
 import httpx
 from fastapi import HTTPException
 from typing import List, Dict, Any, Optional
+from app.core.http_clients import http_clients
+from app.core.revalidate import fetch_json
 
 class IslamicService:
     def __init__(self):
@@ -18,34 +20,34 @@ class IslamicService:
         ]
 
     async def get_all_surahs(self):
-        async with httpx.AsyncClient() as client:
-            resp = await client.get(f"{self.quran_base_url}/surat")
-            if resp.status_code != 200:
-                raise HTTPException(status_code=resp.status_code, detail="Failed to fetch Surahs")
-            return resp.json()
+        client = http_clients.get("islamic")
+        try:
+            return await fetch_json(client, f"{self.quran_base_url}/surat")
+        except httpx.HTTPStatusError as e:
+            raise HTTPException(status_code=e.response.status_code, detail="Failed to fetch Surahs")
 
     async def get_surah_detail(self, nomor: int):
-        async with httpx.AsyncClient() as client:
-            resp = await client.get(f"{self.quran_base_url}/surat/{nomor}")
-            if resp.status_code != 200:
-                raise HTTPException(status_code=resp.status_code, detail="Failed to fetch Surah detail")
-            return resp.json()
+        client = http_clients.get("islamic")
+        try:
+            return await fetch_json(client, f"{self.quran_base_url}/surat/{nomor}")
+        except httpx.HTTPStatusError as e:
+            raise HTTPException(status_code=e.response.status_code, detail="Failed to fetch Surah detail")
 
     async def get_hadith_books(self):
         # Using a reliable endpoint or static list. Using fawazahmed0/hadith-api typically requires knowing the book structure or checking their editions.json
         # For simplicity, we can fetch editions and filter or return a static known list if the API is complex.
         # Let's try fetching editions.json from the CDN
-        async with httpx.AsyncClient() as client:
-            resp = await client.get(f"{self.hadith_base_url}/editions.json")
-            if resp.status_code != 200:
-                raise HTTPException(status_code=resp.status_code, detail="Failed to fetch Hadith books")
+        client = http_clients.get("islamic")
+        try:
+            raw_data = await fetch_json(client, f"{self.hadith_base_url}/editions.json")
+        except httpx.HTTPStatusError as e:
+            raise HTTPException(status_code=e.response.status_code, detail="Failed to fetch Hadith books")
             
-            # Filter for some major collections to return a clean list
-            raw_data = resp.json()
-            # This API returns a huge list. Let's return a subset or manageable structure if possible.
-            # Or just return raw data if user wants exploring.
-            # Better approach: Return major books
-            return raw_data
+        # Filter for some major collections to return a clean list
+        # This API returns a huge list. Let's return a subset or manageable structure if possible.
+        # Or just return raw data if user wants exploring.
+        # Better approach: Return major books
+        return raw_data
 
     async def get_hadith_by_book(self, book: str, limit: int = 50, page: int = 1):
         # NOTE: This CDN API splits by numbered JSON files (e.g. bukhari/1.json).
@@ -57,17 +59,18 @@ class IslamicService:
         # or warn the user this is a basic implementation.
         
         # Let's interpret 'book' as the edition name (e.g., 'eng-bukhari').
-        async with httpx.AsyncClient() as client:
-            # Try fetching the whole book index if available, or the first section
-            # The structure is often: /editions/{edition}/sections.json or similar.
-            # Let's return the sections first.
-            resp = await client.get(f"{self.hadith_base_url}/editions/{book}/sections.json")
-            if resp.status_code == 200:
-                return resp.json()
+        client = http_clients.get("islamic")
+        # Try fetching the whole book index if available, or the first section
+        # The structure is often: /editions/{edition}/sections.json or similar.
+        # Let's return the sections first.
+        try:
+            return await fetch_json(client, f"{self.hadith_base_url}/editions/{book}/sections.json")
+        except httpx.HTTPStatusError:
+            pass
             
-            # If not found, maybe they wanted specific hadiths.
-            # Fallback handling can be improved later.
-            raise HTTPException(status_code=404, detail="Book/Edition not found or API structure mismatch")
+        # If not found, maybe they wanted specific hadiths.
+        # Fallback handling can be improved later.
+        raise HTTPException(status_code=404, detail="Book/Edition not found or API structure mismatch")
 
     async def get_prayer_times(self, lat: float, long: float, date: Optional[str] = None):
         # Date format DD-MM-YYYY. If None, use current timestamp/today by default
@@ -75,14 +78,14 @@ class IslamicService:
         if not date:
             date = datetime.date.today().strftime("%d-%m-%Y")
         
-        async with httpx.AsyncClient() as client:
-            resp = await client.get(
-                f"{self.imsak_base_url}/timings/{date}",
-                params={"latitude": lat, "longitude": long, "method": 3} # Method 3: Muslim World League
-            )
-            if resp.status_code != 200:
-                raise HTTPException(status_code=resp.status_code, detail="Failed to fetch prayer times")
-            return resp.json()
+        client = http_clients.get("islamic")
+        resp = await client.get(
+            f"{self.imsak_base_url}/timings/{date}",
+            params={"latitude": lat, "longitude": long, "method": 3} # Method 3: Muslim World League
+        )
+        if resp.status_code != 200:
+            raise HTTPException(status_code=resp.status_code, detail="Failed to fetch prayer times")
+        return resp.json()
 
     def get_tahlil(self):
         return {"data": self.tahlil_data}
@@ -0,0 +1,138 @@
+import itertools
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable
+
+import httpx
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.core.http_clients import http_clients
+
+# header upstream yang diteruskan ke client (Range/seek perlu Content-Range & Accept-Ranges)
+_PASS_HEADERS = (
+    "content-type",
+    "content-length",
+    "content-range",
+    "content-encoding",
+    "accept-ranges",
+    "last-modified",
+    "etag",
+)
+
+# HLS/DASH berupa banyak segmen, tidak bisa di-relay sebagai satu file
+_UNSUPPORTED_PROTOCOLS = ("m3u8", "m3u8_native", "http_dash_segments", "f4m", "ism")
+
+
+class MediaProxy:
+    """
+    Relays a media file from its (often IP-bound or header-protected) CDN URL
+    through the shared HTTP client in fixed-size chunks, never buffering the
+    whole file. Client `Range` headers are forwarded for seeking/resume.
+    """
+
+    def __init__(self) -> None:
+        self._ids = itertools.count(1)
+        self._active: dict[int, dict[str, Any]] = {}
+        self._recent: deque[dict[str, Any]] = deque(maxlen=50)
+        self.total_streams = 0
+        self.total_bytes = 0
+        self.rejected = 0
+
+    async def open(
+        self, fmt: dict[str, Any], range_header: str | None = None
+    ) -> tuple[int, dict[str, str], AsyncIterator[bytes], Callable[[], Awaitable[None]]]:
+        """
+        Returns (status, headers, body, close). `close` is idempotent and must run
+        even when the body is never iterated (client aborted before the first
+        chunk), e.g. as the response's background task.
+        """
+        if fmt.get("protocol") in _UNSUPPORTED_PROTOCOLS:
+            raise HTTPException(
+                status_code=400,
+                detail={"ok": False, "error": f"format {fmt.get('format_id')} is {fmt.get('protocol')}, pick a progressive/http format"},
+            )
+        if len(self._active) >= settings.stream_max_concurrent:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=503,
+                detail={"ok": False, "error": "too many concurrent streams, try again later"},
+                headers={"Retry-After": "10"},
+            )
+
+        headers = dict(fmt.get("http_headers") or {})
+        if range_header:
+            headers["Range"] = range_header
+
+        stream_id = next(self._ids)
+        stat = {
+            "id": stream_id,
+            "format_id": fmt.get("format_id"),
+            "range": range_header,
+            "started_at": time.time(),
+            "bytes": 0,
+        }
+        # slot dipesan sebelum await supaya cap tetap berlaku untuk request yang datang bersamaan
+        self._active[stream_id] = stat
+
+        client = http_clients.get("media")
+        try:
+            resp = await client.send(client.build_request("GET", fmt["url"], headers=headers), stream=True)
+        except httpx.HTTPError as e:
+            self._active.pop(stream_id, None)
+            raise HTTPException(status_code=502, detail={"ok": False, "error": str(e)})
+        if resp.status_code >= 400:
+            await resp.aclose()
+            self._active.pop(stream_id, None)
+            raise HTTPException(
+                status_code=502,
+                detail={"ok": False, "error": f"upstream answered {resp.status_code}, links may have expired"},
+            )
+
+        out_headers = {k: v for k, v in resp.headers.items() if k.lower() in _PASS_HEADERS}
+        out_headers.setdefault("accept-ranges", "bytes")
+        stat["status"] = resp.status_code
+
+        async def close() -> None:
+            await self._close(resp, stat)
+
+        return resp.status_code, out_headers, self._relay(resp, stat), close
+
+    async def _relay(self, resp: httpx.Response, stat: dict[str, Any]) -> AsyncIterator[bytes]:
+        try:
+            async for chunk in resp.aiter_raw(settings.stream_chunk_bytes):
+                stat["bytes"] += len(chunk)
+                yield chunk
+        finally:
+            await self._close(resp, stat)
+
+    async def _close(self, resp: httpx.Response, stat: dict[str, Any]) -> None:
+        # aman dipanggil dua kali: aclose() no-op kalau sudah tertutup, _finish cek _active
+        await resp.aclose()
+        self._finish(stat)
+
+    def _finish(self, stat: dict[str, Any]) -> None:
+        if self._active.pop(stat["id"], None) is None:
+            return
+        elapsed = max(time.time() - stat["started_at"], 1e-6)
+        self.total_streams += 1
+        self.total_bytes += stat["bytes"]
+        self._recent.append({**stat, "seconds": round(elapsed, 3), "bytes_per_sec": int(stat["bytes"] / elapsed)})
+
+    def stats(self) -> dict[str, Any]:
+        now = time.time()
+        active = []
+        for stat in self._active.values():
+            elapsed = max(now - stat["started_at"], 1e-6)
+            active.append({**stat, "seconds": round(elapsed, 3), "bytes_per_sec": int(stat["bytes"] / elapsed)})
+        return {
+            "max_concurrent": settings.stream_max_concurrent,
+            "active": active,
+            "recent": list(self._recent),
+            "total_streams": self.total_streams,
+            "total_bytes": self.total_bytes,
+            "rejected": self.rejected,
+        }
+
+
+media_proxy = MediaProxy()
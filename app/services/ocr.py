@@ -1,6 +1,7 @@
-import httpx
 from fastapi import HTTPException, UploadFile
 from typing import Optional, Dict, Any
+from app.core.http_clients import http_clients
+from app.core.remote_fetch import IMAGE_TYPES, remote_fetcher
 
 class OCRService:
     def __init__(self):
@@ -38,28 +39,31 @@ class OCRService:
         We can set expiry to 1 day.
         """
         url = "https://file.io"
-        async with httpx.AsyncClient() as client:
-            files = {'file': (filename, file_content)}
-            resp = await client.post(url, files=files, data={"expires": "1d"})
-            if resp.status_code != 200:
-                try:
-                    detail = resp.json()
-                except:
-                    detail = resp.text
-                raise HTTPException(status_code=502, detail=f"Failed to upload to temp storage: {detail}")
+        client = http_clients.get("ocr")
+        files = {'file': (filename, file_content)}
+        resp = await client.post(url, files=files, data={"expires": "1d"})
+        if resp.status_code != 200:
+            try:
+                detail = resp.json()
+            except:
+                detail = resp.text
+            raise HTTPException(status_code=502, detail=f"Failed to upload to temp storage: {detail}")
             
-            data = resp.json()
-            if not data.get("success"):
-                 raise HTTPException(status_code=502, detail="Temp storage service reported failure")
+        data = resp.json()
+        if not data.get("success"):
+             raise HTTPException(status_code=502, detail="Temp storage service reported failure")
             
-            return data.get("link")
+        return data.get("link")
 
     async def extract_ktp_data(self, file_url: Optional[str] = None, file: Optional[UploadFile] = None) -> Dict[str, Any]:
         if not file_url and not file:
             raise HTTPException(status_code=400, detail="Either file_url or file must be provided")
 
         final_url = file_url
-        
+        if file_url and not file:
+            # cek header saja (tipe + ukuran) sebelum URL diteruskan ke Base44
+            await remote_fetcher.probe(file_url, allowed_types=IMAGE_TYPES + ("application/pdf",))
+
         # If file is uploaded, upload to temp storage first
         if file:
             content = await file.read()
@@ -77,12 +81,12 @@ class OCRService:
             "Content-Type": "application/json"
         }
 
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            resp = await client.post(self.endpoint_url, headers=headers, json=payload)
+        client = http_clients.get("ocr")
+        resp = await client.post(self.endpoint_url, headers=headers, json=payload)
             
-            if resp.status_code != 200:
-                 raise HTTPException(status_code=resp.status_code, detail=f"OCR Provider Error: {resp.text}")
+        if resp.status_code != 200:
+             raise HTTPException(status_code=resp.status_code, detail=f"OCR Provider Error: {resp.text}")
             
-            return resp.json()
+        return resp.json()
 
 ocr_service = OCRService()
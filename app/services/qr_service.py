@@ -0,0 +1,70 @@
+import io
+
+import numpy as np
+import qrcode
+from qrcode.constants import ERROR_CORRECT_H, ERROR_CORRECT_L, ERROR_CORRECT_M, ERROR_CORRECT_Q
+from PIL import Image
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+ERROR_CORRECTION = {"L": ERROR_CORRECT_L, "M": ERROR_CORRECT_M, "Q": ERROR_CORRECT_Q, "H": ERROR_CORRECT_H}
+MEDIA_TYPES = {"png": "image/png", "svg": "image/svg+xml"}
+
+# kode pembayaran/tiket yang sama sering diminta berulang; simpan hasil encode-nya
+_cache = TTLCache(
+    max_entries=settings.qr_cache_max_entries,
+    max_bytes=settings.qr_cache_max_bytes,
+    sweep_interval_seconds=settings.cache_sweep_interval_seconds,
+)
+
+
+def qr_matrix(text: str, error_correction: str = "M", border: int = 4) -> np.ndarray:
+    """Module matrix (True = dark) including the quiet-zone border."""
+    qr = qrcode.QRCode(version=None, error_correction=ERROR_CORRECTION[error_correction], border=border)
+    qr.add_data(text)
+    qr.make(fit=True)
+    return np.asarray(qr.get_matrix(), dtype=bool)
+
+
+def matrix_to_png(matrix: np.ndarray, box_size: int) -> bytes:
+    # blok box_size x box_size per modul via np.repeat, bukan gambar kotak satu per satu
+    pixels = np.repeat(np.repeat(~matrix, box_size, axis=0), box_size, axis=1)
+    buf = io.BytesIO()
+    Image.fromarray(pixels).save(buf, format="PNG")  # bool array -> mode "1", PNG 1-bit
+    return buf.getvalue()
+
+
+def matrix_to_svg(matrix: np.ndarray, box_size: int) -> bytes:
+    """One `<path>` in module units: a horizontal run of dark modules becomes one rectangle."""
+    n = matrix.shape[0]
+    parts: list[str] = []
+    for y, row in enumerate(matrix):
+        # batas run: posisi di mana nilai modul berubah
+        edges = np.flatnonzero(np.diff(np.concatenate(([False], row, [False])).astype(np.int8)))
+        for start, end in zip(edges[::2], edges[1::2]):
+            parts.append(f"M{start},{y}h{end - start}v1h-{end - start}z")
+    size = n * box_size
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{size}" height="{size}" '
+        f'viewBox="0 0 {n} {n}" shape-rendering="crispEdges">'
+        f'<rect width="{n}" height="{n}" fill="#fff"/>'
+        f'<path fill="#000" d="{"".join(parts)}"/></svg>'
+    ).encode("ascii")
+
+
+def render_qr(text: str, format: str = "png", box_size: int = 10, border: int = 4, error_correction: str = "M") -> bytes:
+    """Encoded QR image, served from the LRU cache for repeated text + options."""
+    key = f"{format}:{box_size}:{border}:{error_correction}:{text}"
+
+    def build() -> bytes:
+        matrix = qr_matrix(text, error_correction, border)
+        if format == "svg":
+            return matrix_to_svg(matrix, box_size)
+        return matrix_to_png(matrix, box_size)
+
+    return _cache.get_or_compute(key, build, ttl_seconds=settings.qr_cache_ttl_seconds).value
+
+
+def qr_cache_stats() -> dict:
+    return _cache.stats()
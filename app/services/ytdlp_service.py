@@ -1,8 +1,108 @@
 from __future__ import annotations
 
+import functools
+import re
 from typing import Any
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
 import yt_dlp
 
+from app.core.config import settings
+from app.core.executors import BoundedExecutor
+
+
+def _warm_worker() -> None:
+    # jalan sekali per worker process: import + load daftar extractor sekarang,
+    # bukan di request pertama
+    yt_dlp.extractor.gen_extractor_classes()
+
+
+# ekstraksi yt-dlp berat (regex + JSON, pegang GIL) -> jalankan di process pool terpisah
+ytdlp_pool = BoundedExecutor(
+    name="yt-dlp",
+    kind="process",
+    max_concurrency=settings.ytdlp_workers,
+    max_queue=settings.ytdlp_max_queue,
+    timeout_seconds=settings.ytdlp_job_timeout_seconds,
+    retry_after_seconds=settings.ytdlp_retry_after_seconds,
+    initializer=_warm_worker,
+)
+
+
+@functools.lru_cache(maxsize=1)
+def _extractor_classes() -> tuple:
+    # GenericIE cocok untuk semua URL, jadi tidak berguna untuk canonical key
+    return tuple(ie for ie in yt_dlp.extractor.gen_extractor_classes() if ie.ie_key() != "Generic")
+
+
+# host -> extractor yang terakhir cocok, dicoba duluan sebelum scan semua extractor
+_host_hint: dict[str, Any] = {}
+
+
+# extract_media_info pakai noplaylist=True, jadi parameter playlist tidak mengubah video yang
+# diekstrak; dibuang sebelum matching supaya `watch?v=X&list=...` tetap jatuh ke extractor video
+_PLAYLIST_PARAMS = frozenset({"list", "index"})
+
+
+def _strip_playlist_params(url: str) -> str:
+    parts = urlsplit(url)
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k not in _PLAYLIST_PARAMS]
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def _is_collection(ie: Any) -> bool:
+    # id playlist/tab/channel menunjuk banyak video, bukan video yang benar-benar diekstrak
+    return getattr(ie, "_RETURN_TYPE", None) == "playlist" or ie.ie_key().endswith("Tab")
+
+
+def _match_canonical(ie: Any, url: str) -> str | None:
+    if _is_collection(ie):
+        return None
+    try:
+        if not ie.suitable(url):
+            return None
+        video_id = ie._match_id(url)
+    except Exception:
+        return None
+    return f"{ie.ie_key()}:{video_id}" if video_id else None
+
+
+@functools.lru_cache(maxsize=settings.ytdlp_canonical_cache_size)
+def canonical_key(url: str) -> str:
+    """
+    Map a URL to `extractor_key:video_id` using yt-dlp's URL patterns only (no
+    network), so `youtu.be/X`, `m.youtube.com/watch?v=X&si=...` or TikTok links
+    with tracking params share one cache entry. Playlist parameters are ignored
+    and playlist/channel extractors never provide a key, so two videos from the
+    same playlist stay apart:
+
+        watch?v=AAAAAAAAAAA&list=PLxyz -> Youtube:AAAAAAAAAAA
+        watch?v=BBBBBBBBBBB&list=PLxyz -> Youtube:BBBBBBBBBBB
+
+    Unknown URLs fall back to the URL itself.
+    """
+    url = url.strip()
+    candidate = _strip_playlist_params(url)
+    host = urlsplit(url).netloc.lower()
+    hinted = _host_hint.get(host)
+    if hinted is not None:
+        key = _match_canonical(hinted, candidate)
+        if key:
+            return key
+
+    for ie in _extractor_classes():
+        if ie is hinted:
+            continue
+        key = _match_canonical(ie, candidate)
+        if key:
+            _host_hint[host] = ie
+            return key
+    return f"url:{url}"
+
+
+def warm_canonical_index() -> None:
+    """Compile every extractor URL pattern once (~1s) so canonical_key stays in the ms range."""
+    canonical_key("https://warmup.invalid/")
+
 
 def _pick_best_progressive(formats: list[dict[str, Any]]) -> dict[str, Any] | None:
     # progressive = ada video + audio dalam 1 file
@@ -66,7 +166,86 @@ def _pick_best_audio_only(formats: list[dict[str, Any]]) -> dict[str, Any] | Non
     return sorted(audio_only, key=score, reverse=True)[0]
 
 
-def extract_media_info(url: str) -> dict[str, Any]:
+_PICKERS = {
+    "progressive": _pick_best_progressive,
+    "video": _pick_best_video_only,
+    "audio": _pick_best_audio_only,
+}
+
+
+def pick_format(
+    formats: list[dict[str, Any]], kind: str = "progressive", format_id: str | None = None
+) -> dict[str, Any] | None:
+    """Exact `format_id` if given, otherwise the best format of `kind` (progressive/video/audio)."""
+    if format_id:
+        return next((f for f in formats if f.get("format_id") == format_id and f.get("url")), None)
+    return _PICKERS[kind](formats)
+
+
+# parameter query berisi unix timestamp kedaluwarsa (googlevideo, TikTok, CloudFront, dll)
+_EXPIRY_PARAMS = ("expire", "expires", "x-expires")
+# googlevideo kadang taruh di path: .../expire/1700000000/...
+_EXPIRY_PATH_RE = re.compile(r"/expire/(\d{9,11})(?:/|$)")
+
+
+def url_expiry(url: str | None) -> float | None:
+    """Unix time a signed media URL stops working, or None when it carries no expiry."""
+    if not url:
+        return None
+    parts = urlsplit(url)
+    for name, value in parse_qsl(parts.query):
+        name = name.lower()
+        try:
+            if name in _EXPIRY_PARAMS:
+                ts = float(value)
+            elif name == "oe":
+                # Instagram/Facebook CDN: hex timestamp
+                ts = float(int(value, 16))
+            else:
+                continue
+        except ValueError:
+            continue
+        if ts > 1_000_000_000:
+            return ts
+    m = _EXPIRY_PATH_RE.search(parts.path)
+    return float(m.group(1)) if m else None
+
+
+def direct_links_expiry(direct: dict[str, Any]) -> float | None:
+    """Earliest expiry among the picked formats."""
+    expiries = [url_expiry(f.get("url")) for f in direct.values() if f]
+    expiries = [e for e in expiries if e is not None]
+    return min(expiries) if expiries else None
+
+
+# preset `slim`: cukup untuk tampilan + pilih format, tanpa subtitles/thumbnails/fragments
+SLIM_FIELDS = (
+    "id", "title", "uploader", "channel", "duration", "thumbnail", "webpage_url",
+    "extractor", "extractor_key", "upload_date", "view_count", "like_count", "formats",
+)
+SLIM_FORMAT_FIELDS = (
+    "format_id", "url", "ext", "protocol", "vcodec", "acodec", "width", "height",
+    "fps", "abr", "tbr", "filesize", "filesize_approx", "format_note",
+)
+
+
+def project_info(
+    info: dict[str, Any],
+    fields: tuple[str, ...] | None = None,
+    format_fields: tuple[str, ...] | None = None,
+) -> dict[str, Any]:
+    """Keep only `fields` of the info dict and `format_fields` of each format (None = keep all)."""
+    out = {k: info[k] for k in fields if k in info} if fields else dict(info)
+    if format_fields and out.get("formats"):
+        out["formats"] = [{k: f[k] for k in format_fields if k in f} for f in out["formats"]]
+    return out
+
+
+def extract_media_info(
+    url: str,
+    fields: tuple[str, ...] | None = None,
+    format_fields: tuple[str, ...] | None = None,
+) -> dict[str, Any]:
     ydl_opts = {
         "quiet": True,
         "no_warnings": True,
@@ -85,6 +264,9 @@ def extract_media_info(url: str) -> dict[str, Any]:
         if first:
             info = first
 
+    # proyeksi di worker: yang di-pickle balik, di-cache dan di-encode sudah kecil
+    if fields or format_fields:
+        info = project_info(info, fields, format_fields)
     return info
 
 
@@ -95,31 +277,39 @@ def build_direct_links(info: dict[str, Any]) -> dict[str, Any]:
     best_video = _pick_best_video_only(formats)
     best_audio = _pick_best_audio_only(formats)
 
+    direct = {
+        "progressive": best_progressive and {
+            "url": best_progressive.get("url"),
+            "ext": best_progressive.get("ext"),
+            "height": best_progressive.get("height"),
+            "format_id": best_progressive.get("format_id"),
+        },
+        "video_only": best_video and {
+            "url": best_video.get("url"),
+            "ext": best_video.get("ext"),
+            "height": best_video.get("height"),
+            "format_id": best_video.get("format_id"),
+        },
+        "audio_only": best_audio and {
+            "url": best_audio.get("url"),
+            "ext": best_audio.get("ext"),
+            "abr": best_audio.get("abr"),
+            "format_id": best_audio.get("format_id"),
+        },
+    }
+
     return {
         "title": info.get("title"),
         "extractor": info.get("extractor"),
         "duration": info.get("duration"),
         "thumbnail": info.get("thumbnail"),
         "webpage_url": info.get("webpage_url"),
-        "direct": {
-            "progressive": best_progressive and {
-                "url": best_progressive.get("url"),
-                "ext": best_progressive.get("ext"),
-                "height": best_progressive.get("height"),
-                "format_id": best_progressive.get("format_id"),
-            },
-            "video_only": best_video and {
-                "url": best_video.get("url"),
-                "ext": best_video.get("ext"),
-                "height": best_video.get("height"),
-                "format_id": best_video.get("format_id"),
-            },
-            "audio_only": best_audio and {
-                "url": best_audio.get("url"),
-                "ext": best_audio.get("ext"),
-                "abr": best_audio.get("abr"),
-                "format_id": best_audio.get("format_id"),
-            },
-        },
+        "direct": direct,
+        "expires_at": direct_links_expiry(direct),
         "note": "Direct URL biasanya punya masa berlaku (expired). Kalau 403/expired, panggil ulang endpoint ini.",
-    }
\ No newline at end of file
+    }
+
+
+def extract_direct_links(url: str) -> dict[str, Any]:
+    # dipanggil di worker process: yang dikirim balik cuma ringkasan kecil, bukan info dict penuh
+    return build_direct_links(extract_media_info(url))
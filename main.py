@@ -1,9 +1,14 @@
+import asyncio
 from contextlib import asynccontextmanager
-import httpx
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.core.config import cors_origins_list
+from app.core.config import cors_origins_list, settings
+from app.core.http_clients import http_clients
+from app.services.convert_jobs import convert_jobs
+from app.services.image_service import image_pool, rembg_pool
+from app.services.ytdlp_service import warm_canonical_index, ytdlp_pool
 from app.routers.meta import router as meta_router
 from app.routers.bmkg import router as bmkg_router
 from app.routers.downloaders import router as dl_router
@@ -18,16 +23,28 @@ from app.routers.ocr import router as ocr_router
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    timeout = httpx.Timeout(30.0, connect=10.0)
-    async with httpx.AsyncClient(timeout=timeout, follow_redirects=True) as client:
-        app.state.http = client
+    app.state.http = http_clients.get("default")
+    ytdlp_pool.start()
+    image_pool.start()
+    convert_jobs.start()
+    await asyncio.to_thread(warm_canonical_index)
+    if settings.rembg_preload:
+        # model bisa perlu di-download dulu; jangan tahan startup, /health lapor kapan siap
+        app.state.rembg_preload = asyncio.create_task(asyncio.to_thread(rembg_pool.preload))
+    try:
         yield
+    finally:
+        ytdlp_pool.shutdown()
+        image_pool.shutdown()
+        convert_jobs.shutdown()
+        await http_clients.aclose()
 
 
 app = FastAPI(
     title="Personal Tools API",
     version="1.0.0",
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
 # CORS